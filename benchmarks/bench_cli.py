@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""End-to-end benchmark of htbcli commands against benchmarks/mock_api.py.
+
+Every scenario runs HTBCLI(argv).run() in this process, first with an empty
+~/.cache/htbcli (cold) and then again with whatever the cold run cached
+(warm). For each it reports wall time, the API requests made and the peak
+Python memory (tracemalloc) while it ran. Prints a table, or JSON with --json.
+
+Request counts are the regression guard: --save-baseline FILE records them,
+--baseline FILE fails if any scenario now makes more requests than recorded.
+
+    python benchmarks/bench_cli.py --runs 3 --latency 0.02
+    python benchmarks/bench_cli.py --baseline benchmarks/baseline.json
+"""
+import argparse
+import atexit
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout, redirect_stderr
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_api import MockAPI, MACHINE  # noqa: E402
+
+# name -> argv after the global options, {dir} is a scratch directory for downloads
+SCENARIOS = {
+    "challenge info": ["challenge", "-n", "Weak RSA"],
+    "challenge download": ["challenge", "-n", "Weak RSA", "-p", "{dir}"],
+    "challenge docker": ["challenge", "-n", "2", "-s"],
+    "challenge reset": ["challenge", "-n", "2", "-r"],
+    "challenge all": ["challenge", "-n", "2", "-p", "{dir}", "-s", "-r"],
+    "machine info": ["machine", "-n", "Lame"],
+    "machine spawn": ["machine", "-n", "1", "-s"],
+    "machine spawn+stop": ["machine", "-n", "1", "-s", "--stop"],
+    "machine spawn+reset": ["machine", "-n", "1", "-s", "-r"],
+    "machine stop": ["machine", "-n", "Lame", "--stop"],
+    "machine reset": ["machine", "-n", "Lame", "-r"],
+    "machine stop+reset": ["machine", "-n", "Lame", "--stop", "-r"],
+    "vpn download": ["vpn", "-d", "{dir}"],
+    "vpn switch": ["vpn", "-s", "EU Free 2"],
+    "status": ["status"],
+    "sync": ["sync"],
+}
+# Scenarios that start with a machine already assigned on the mock
+ASSIGNED = {"machine stop", "machine reset", "machine stop+reset"}
+# Scenarios expected to fail: after --stop there's nothing left for -r to reset
+EXPECTED_EXIT = {"machine stop+reset": 1}
+
+
+def run_once(api: MockAPI, home: str, cred: str, argv: list, active=None) -> dict:
+    """Run one htbcli invocation, returns wall seconds, requests and peak memory"""
+    from htbcli.__main__ import HTBCLI
+    scratch = tempfile.mkdtemp(dir=home)
+    argv = ["-c", cred, "--no-agent"] + [a.replace("{dir}", scratch) for a in argv]
+    api.reset(active)
+    out = io.StringIO()
+    tracemalloc.start()
+    start = time.perf_counter()
+    code = 0
+    h = None
+    with redirect_stdout(out), redirect_stderr(out):
+        try:
+            h = HTBCLI(argv)
+            code = h.report(h.run)
+        except SystemExit as e:
+            code = e.code or 0
+    elapsed = time.perf_counter() - start
+    client = getattr(h, "client", None)
+    if client is not None:
+        # Every client registers an atexit token dump, don't let them pile up
+        atexit.unregister(client.dump_to_cache)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    shutil.rmtree(scratch, ignore_errors=True)
+    return {"seconds": elapsed, "requests": len(api.requests), "peak_kib": peak / 1024, "exit_code": code,
+            "endpoints": [f"{m} {p}" for m, p, _ in api.requests], "output": out.getvalue()}
+
+
+def bench(api: MockAPI, runs: int, only=None) -> dict:
+    home = tempfile.mkdtemp(prefix="htbcli-bench-")
+    os.environ["HOME"] = home
+    os.environ["HTBCLI_API_BASE"] = api.base
+    cred = os.path.join(home, "cred.json")
+    with open(cred, 'w') as f:
+        json.dump({"app_token": "benchmark"}, f)
+    # cache paths are worked out at import time, so only import htbcli once HOME points at the scratch dir
+    from htbcli.utils.cache import DEFAULT_CACHE_DIR
+
+    results = {}
+    try:
+        for name, argv in SCENARIOS.items():
+            if only and name not in only:
+                continue
+            cold, warm = [], []
+            active = MACHINE if name in ASSIGNED else None
+            for _ in range(runs):
+                shutil.rmtree(DEFAULT_CACHE_DIR, ignore_errors=True)
+                cold.append(run_once(api, home, cred, argv, active))
+                warm.append(run_once(api, home, cred, argv, active))
+            results[name] = {
+                "cold_ms": round(statistics.median(r["seconds"] for r in cold) * 1000, 1),
+                "warm_ms": round(statistics.median(r["seconds"] for r in warm) * 1000, 1),
+                "cold_requests": cold[-1]["requests"],
+                "warm_requests": warm[-1]["requests"],
+                "peak_kib": round(max(r["peak_kib"] for r in cold + warm), 1),
+                "exit_code": cold[-1]["exit_code"],
+                "cold_endpoints": cold[-1]["endpoints"],
+                "warm_endpoints": warm[-1]["endpoints"],
+            }
+            if cold[-1]["exit_code"] != EXPECTED_EXIT.get(name, 0):
+                results[name]["output"] = cold[-1]["output"]
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+    return results
+
+
+def print_table(results: dict, file=sys.stdout):
+    print('─'*92, file=file)
+    print(f"{'scenario':<20} {'cold ms':>9} {'warm ms':>9} {'cold reqs':>10} {'warm reqs':>10} {'peak KiB':>10} {'exit':>5}", file=file)
+    for name, r in results.items():
+        print(f"{name:<20} {r['cold_ms']:>9.1f} {r['warm_ms']:>9.1f} {r['cold_requests']:>10} "
+              f"{r['warm_requests']:>10} {r['peak_kib']:>10.1f} {r['exit_code']:>5}", file=file)
+    print('─'*92, file=file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark htbcli commands against the mock HTB API.")
+    parser.add_argument('--runs', type=int, default=3, help='Cold/warm pairs per scenario, medians are reported.')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds the mock adds to every response.')
+    parser.add_argument('--download-size', type=int, default=8 * 1024 * 1024, help='Challenge zip size in bytes.')
+    parser.add_argument('--rate-limit', action="store_true", help="Keep htbcli's client-side rate limiter on.")
+    parser.add_argument('--only', action='append', help='Only run this scenario (repeatable).')
+    parser.add_argument('--json', action="store_true", help='Print JSON instead of a table.')
+    parser.add_argument('--verbose', action="store_true", help='List the endpoints each scenario called.')
+    parser.add_argument('--baseline', type=str, help='Fail if any scenario makes more requests than in this file.')
+    parser.add_argument('--save-baseline', type=str, help='Write request counts to this file.')
+    args = parser.parse_args()
+
+    if not args.rate_limit:
+        os.environ["HTBCLI_RATE_LIMIT"] = "off"
+    api = MockAPI(latency=args.latency, download_size=args.download_size).start()
+    try:
+        results = bench(api, args.runs, args.only)
+    finally:
+        api.stop()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+        if args.verbose:
+            for name, r in results.items():
+                print(f"{name}:\n  cold: {', '.join(r['cold_endpoints'])}\n  warm: {', '.join(r['warm_endpoints'])}")
+
+    counts = {name: {"cold": r["cold_requests"], "warm": r["warm_requests"]} for name, r in results.items()}
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(counts, f, indent=2)
+            f.write("\n")
+
+    failures = [f"{name} exited with {r['exit_code']}" for name, r in results.items()
+                if r["exit_code"] != EXPECTED_EXIT.get(name, 0)]
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        for name, count in counts.items():
+            for phase in ("cold", "warm"):
+                limit = baseline.get(name, {}).get(phase)
+                if limit is not None and count[phase] > limit:
+                    failures.append(f"{name} ({phase}) made {count[phase]} requests, baseline is {limit}")
+    for failure in failures:
+        print(f"REGRESSION: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""Local stand-in for the HTB v4 API, for benchmarks and trying htbcli without an account.
+
+Serves canned responses (FIXTURES, shaped like real API responses) for the
+endpoints htbcli uses, and keeps just enough state for flows to make sense:
+spawning a machine makes it active, stopping it clears it, and so on.
+
+Knobs, all optional:
+  latency       seconds added to every response
+  error_rate    fraction of requests answered with a 500
+  rate_limit    every Nth request gets a 429 with Retry-After: 1
+  download_size size of the challenge zip in bytes
+
+Responses carry an ETag and honour If-None-Match, downloads also honour Range and If-Range.
+Every request is recorded in .requests as (method, path, seconds since start).
+Real responses can be swapped in with overrides={"machine/list": {...}, ...}
+or --fixtures FILE when run standalone:
+
+    python benchmarks/mock_api.py --port 8080 --latency 0.05
+    HTBCLI_API_BASE=http://127.0.0.1:8080/api/v4/ htbcli -c cred.json machine -n Lame
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import unquote
+
+MACHINE = {
+    "id": 1, "name": "Lame", "os": "Linux", "points": 20, "release": "2017-03-14T00:00:00.000000Z",
+    "user_owns_count": 40213, "root_owns_count": 41950, "authUserInUserOwns": False, "authUserInRootOwns": False,
+    "authUserHasReviewed": False, "stars": "4.5", "avatar": "/storage/avatars/lame.png", "difficultyText": "Easy",
+    "free": True, "maker": {"id": 1, "name": "ch4p", "avatar": None, "isRespected": False}, "maker2": None,
+    "ip": "10.10.10.3", "active": 0, "retired": 1, "feedbackForChart": {"counterCake": 100},
+    "userBlood": None, "rootBlood": None,
+}
+ACTIVE_MACHINE = dict(MACHINE, id=2, name="Keeper", ip=None, active=1, retired=0, difficultyText="Easy",
+                      release="2023-08-12T19:00:00.000000Z")
+CHALLENGE = {
+    "id": 2, "name": "Weak RSA", "retired": 1, "points": "20", "difficulty": "Easy", "difficulty_chart": {},
+    "solves": 20145, "authUserSolve": False, "likes": 700, "dislikes": 50,
+    "release_date": "2017-01-01T00:00:00.000000Z", "description": "Can you decrypt the message and get the flag?",
+    "category_name": "Crypto", "challenge_category_id": 4, "creator_id": 1, "creator2_id": None,
+    "download": True, "docker": True, "docker_ip": None, "docker_port": None,
+}
+SERVERS = [
+    {"id": 1, "friendly_name": "EU Free 1", "current_clients": 120, "location": "EU"},
+    {"id": 2, "friendly_name": "EU Free 2", "current_clients": 45, "location": "EU"},
+    {"id": 6, "friendly_name": "US Free 1", "current_clients": 80, "location": "US"},
+]
+OVPN = b"client\ndev tun\nproto udp\nremote edge-eu-free-1.hackthebox.eu 1337\n" + b"# cert\n" * 800
+
+FIXTURES = {
+    "machine/list": {"info": [ACTIVE_MACHINE]},
+    "machine/list/retired": {"info": [MACHINE]},
+    "challenge/list": {"challenges": [dict(CHALLENGE, id=3, name="Baby Time Capsule", retired=0)]},
+    "challenge/list/retired": {"challenges": [CHALLENGE]},
+    "challenge/categories/list": {"info": [{"id": 4, "name": "Crypto"}, {"id": 5, "name": "Reversing"}]},
+}
+
+
+class MockAPI:
+    def __init__(self, latency=0.0, error_rate=0.0, rate_limit=0, download_size=1024 * 1024, overrides=None,
+                 host="127.0.0.1", port=0) -> None:
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.zip = b"PK\x03\x04" + bytes(random.Random(0).getrandbits(8) for _ in range(min(download_size, 4096))) \
+            * (download_size // 4096 + 1)
+        self.zip = self.zip[:download_size]
+        self.fixtures = dict(FIXTURES, **(overrides or {}))
+        self.requests = []
+        self.first_request = None
+        self.active = None
+        self.assigned = SERVERS[0]
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.base = f"http://{host}:{self.server.server_address[1]}/api/v4/"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset(self, active=None):
+        """Forget recorded requests and instance state between benchmark runs, optionally starting with a machine assigned"""
+        with self.lock:
+            self.requests = []
+            self.first_request = None
+            self.active = active
+            self.assigned = SERVERS[0]
+
+    def route(self, method: str, path: str):
+        """Response for an endpoint: a dict (JSON), bytes (download), or None for a 404"""
+        if path in self.fixtures:
+            return self.fixtures[path]
+        match = re.fullmatch(r"machine/profile/(.+)", path)
+        if match:
+            key = match.group(1).lower()
+            for machine in (MACHINE, ACTIVE_MACHINE):
+                if key in (str(machine["id"]), machine["name"].lower()):
+                    return {"info": machine}
+            return None
+        match = re.fullmatch(r"challenge/info/(.+)", path)
+        if match:
+            if match.group(1).lower() in (str(CHALLENGE["id"]), CHALLENGE["name"].lower()):
+                return {"challenge": CHALLENGE}
+            return None
+        if path == f"challenge/download/{CHALLENGE['id']}":
+            return self.zip
+        if path == "challenge/start":
+            return {"message": "Instance Created!", "id": "abc123", "ip": "127.0.0.1", "port": 31337}
+        if path == "challenge/stop":
+            return {"message": "Instance Stopped!"}
+        if path == "challenge/own":
+            return {"message": "Congratulations"}
+        if path in ("vm/spawn", "machine/play/1", "machine/play/2"):
+            self.active = MACHINE
+            return {"message": "Machine deployed to lab.", "success": True}
+        if path in ("vm/terminate", "machine/stop", "release_arena/terminate"):
+            self.active = None
+            return {"message": "Machine terminated.", "success": True}
+        if path == "vm/reset":
+            return {"message": f"{MACHINE['name']} will be reset in 1 minute."}
+        if path in ("machine/active", "release_arena/active"):
+            if self.active is None:
+                return {"info": None}
+            return {"info": {"id": self.active["id"], "name": self.active["name"], "ip": self.active["ip"],
+                             "type": "Free", "isSpawning": False, "lab_server": "vip_lab"}}
+        if path == "machine/own":
+            return {"status": 200, "message": f"{MACHINE['name']} user is now owned."}
+        if path == "connections":
+            return {"status": True, "data": {"lab": {"can_access": True, "location_type_friendly": "EU - Free",
+                                                     "assigned_server": self.assigned},
+                                             "release_arena": {"can_access": True, "machine": None,
+                                                               "assigned_server": None}}}
+        if path == "connections/servers":
+            options = {}
+            for server in SERVERS:
+                group = options.setdefault(server["location"], {}).setdefault(f"{server['location']} - Free", {"servers": {}})
+                group["servers"][str(server["id"])] = server
+            return {"status": True, "data": {"assigned": self.assigned, "options": options}}
+        match = re.fullmatch(r"connections/servers/switch/(\d+)", path)
+        if match:
+            for server in SERVERS:
+                if server["id"] == int(match.group(1)):
+                    self.assigned = server
+                    return {"status": True, "message": f"VPN server switched to {server['friendly_name']}",
+                            "data": server}
+            return None
+        if path.startswith("access/ovpnfile/"):
+            return OVPN
+        if path == "login/refresh":
+            return {"message": {"access_token": "mock", "refresh_token": "mock"}}
+        return None
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status: int, body=b"", headers=None):
+                self.send_response(status)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def handle_request(self, method: str):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                path = unquote(self.path.split('?', 1)[0]).split("/api/v4/", 1)[-1]
+                with api.lock:
+                    now = time.perf_counter()
+                    if api.first_request is None:
+                        api.first_request = now
+                    api.requests.append((method, self.path.split("/api/v4/", 1)[-1], now - api.started))
+                    count = len(api.requests)
+                if api.latency:
+                    time.sleep(api.latency)
+                if api.rate_limit and count % api.rate_limit == 0:
+                    return self.reply(429, b'{"message":"Too Many Attempts."}', {"Retry-After": "1"})
+                if api.error_rate and random.random() < api.error_rate:
+                    return self.reply(500, b'{"message":"Server Error"}')
+                with api.lock:
+                    res = api.route(method, path)
+                if res is None:
+                    return self.reply(404, b'{"message":"Not Found"}')
+                if isinstance(res, bytes):
+                    start = 0
+                    etag = '"%s"' % hashlib.sha1(res).hexdigest()[:16]
+                    match = re.match(r"bytes=(\d+)-", self.headers.get("Range") or "")
+                    if match and self.headers.get("If-Range", etag) != etag:
+                        # Changed since the client's partial copy, send all of it
+                        match = None
+                    if match and int(match.group(1)) < len(res):
+                        start = int(match.group(1))
+                        return self.reply(206, res[start:], {"Content-Range": f"bytes {start}-{len(res) - 1}/{len(res)}",
+                                                             "ETag": etag})
+                    if match:
+                        return self.reply(416, b"", {"Content-Range": f"bytes */{len(res)}"})
+                    body, content_type = res, "application/octet-stream"
+                else:
+                    body, content_type = json.dumps(res).encode(), "application/json"
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+                if self.headers.get("If-None-Match") == etag:
+                    return self.reply(304, b"", {"ETag": etag})
+                self.reply(200, body, {"Content-Type": content_type, "ETag": etag})
+
+            def do_GET(self):
+                self.handle_request("GET")
+
+            def do_POST(self):
+                self.handle_request("POST")
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the mock HTB API in the foreground.")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with a 500.')
+    parser.add_argument('--rate-limit', type=int, default=0, help='Answer every Nth request with a 429.')
+    parser.add_argument('--download-size', type=int, default=1024 * 1024, help='Challenge zip size in bytes.')
+    parser.add_argument('--fixtures', type=str, help='JSON file of endpoint -> response overrides.')
+    args = parser.parse_args()
+
+    overrides = None
+    if args.fixtures:
+        with open(args.fixtures, 'r') as f:
+            overrides = json.load(f)
+    api = MockAPI(args.latency, args.error_rate, args.rate_limit, args.download_size, overrides, args.host, args.port)
+    print(f"Mock HTB API on {api.base}")
+    try:
+        api.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Startup benchmark for the htbcli entry point.
+
+Measures, in fresh interpreters:
+  - import time of htbcli.__main__ (from python -X importtime)
+  - wall time of `htbcli -h`, plus which third-party modules it loaded
+  - wall time from process start to the first API request, against benchmarks/mock_api.py
+
+Prints one JSON object. Pass --max-* thresholds (milliseconds) to exit non-zero
+on a regression, e.g. in CI:
+
+    python benchmarks/startup.py --runs 10 --max-help-ms 150 --max-import-ms 50
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_api import MockAPI  # noqa: E402
+
+HEAVY_MODULES = ('hackthebox', 'requests', 'urllib3', 'dateutil', 'colorama')
+
+
+def python(code: str):
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                          env=dict(os.environ, PYTHONPATH=ROOT))
+
+
+def import_time_ms() -> float:
+    """Cumulative import time of htbcli.__main__ in microseconds -> ms"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import htbcli.__main__"],
+                            capture_output=True, text=True, env=dict(os.environ, PYTHONPATH=ROOT))
+    for line in result.stderr.splitlines():
+        parts = [p.strip() for p in line.split('|')]
+        if len(parts) == 3 and parts[2] == "htbcli.__main__":
+            return int(parts[1]) / 1000
+    raise RuntimeError(f"couldn't find htbcli.__main__ in importtime output:\n{result.stderr}")
+
+
+HELP_CODE = """
+import sys, time
+start = time.perf_counter()
+sys.argv = ['htbcli', '-h']
+from htbcli.__main__ import main
+try:
+    main()
+except SystemExit:
+    pass
+heavy = sorted({m.split('.')[0] for m in sys.modules} & set(%r))
+print('RESULT', time.perf_counter() - start, ','.join(heavy), file=sys.stderr)
+""" % (HEAVY_MODULES,)
+
+
+def help_run():
+    """(seconds, heavy modules loaded) for one `htbcli -h`"""
+    start = time.perf_counter()
+    result = python(HELP_CODE)
+    elapsed = time.perf_counter() - start
+    for line in result.stderr.splitlines():
+        if line.startswith('RESULT'):
+            _, _, heavy = (line.split(' ', 2) + [''])[:3]
+            return elapsed, [m for m in heavy.split(',') if m]
+    raise RuntimeError(f"htbcli -h failed:\n{result.stderr}")
+
+
+def first_request_run(api: MockAPI, workdir: str) -> float:
+    """Seconds from spawning `htbcli machine -n 1` to its first API request"""
+    cred = os.path.join(workdir, "cred.json")
+    with open(cred, 'w') as f:
+        json.dump({"app_token": "benchmark"}, f)
+    api.reset()
+    env = {"HTBCLI_API_BASE": api.base, "HOME": workdir}
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-m", "htbcli", "--no-agent", "--no-cache", "-c", cred,
+                             "machine", "-n", "1"], capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONPATH=ROOT, **env))
+    if api.first_request is None:
+        raise RuntimeError(f"htbcli never reached the API:\n{result.stdout}{result.stderr}")
+    return api.first_request - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark htbcli startup.")
+    parser.add_argument('--runs', type=int, default=5, help='Runs per measurement, the median is reported.')
+    parser.add_argument('--max-import-ms', type=float, help='Fail if importing htbcli.__main__ takes longer.')
+    parser.add_argument('--max-help-ms', type=float, help='Fail if `htbcli -h` takes longer.')
+    parser.add_argument('--max-first-request-ms', type=float, help='Fail if the first API request comes later.')
+    args = parser.parse_args()
+
+    imports = [import_time_ms() for _ in range(args.runs)]
+    helps = [help_run() for _ in range(args.runs)]
+    api = MockAPI().start()
+    with tempfile.TemporaryDirectory() as workdir:
+        firsts = [first_request_run(api, workdir) for _ in range(args.runs)]
+    api.stop()
+
+    report = {
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "import_ms": round(statistics.median(imports), 1),
+        "help_ms": round(statistics.median(h[0] for h in helps) * 1000, 1),
+        "help_third_party_modules": sorted({m for h in helps for m in h[1]}),
+        "first_request_ms": round(statistics.median(firsts) * 1000, 1),
+    }
+    print(json.dumps(report, indent=2))
+
+    failures = []
+    if report["help_third_party_modules"]:
+        failures.append(f"htbcli -h imported {', '.join(report['help_third_party_modules'])}")
+    for key, limit in (("import_ms", args.max_import_ms), ("help_ms", args.max_help_ms),
+                       ("first_request_ms", args.max_first_request_ms)):
+        if limit is not None and report[key] > limit:
+            failures.append(f"{key} {report[key]} > {limit}")
+    for failure in failures:
+        print(f"REGRESSION: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
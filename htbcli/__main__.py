@@ -2,88 +2,572 @@
 import argparse
 import getpass
 import json
+import os
+import sys
+import time
 
-from hackthebox import *
-from htbcli.connectors.challenge import ChallengeInterface
-from htbcli.connectors.machine import MachineInterface
-from htbcli.connectors.vpn import VpnInterface
+# Only stdlib and htbcli.utils at module level: hackthebox (and requests with it)
+# plus each connector are imported by the subcommand that needs them, so -h and
+# argument errors never pay for them. benchmarks/startup.py keeps an eye on this.
+from htbcli.utils.cache import MetadataCache, account_dir
+from htbcli.utils.index import NameIndex
+from htbcli.utils import agent
 from htbcli.utils.colors import *
 from htbcli.utils.banner import BannerBuilder
-from os.path import expanduser, isdir, isfile, exists
+from htbcli.utils.batch import load_manifest, op_to_argv
+from htbcli.utils.readiness import parse_ports
+from htbcli.utils.profiler import Tracer
+from htbcli.utils.pipeline import Pipeline
+from htbcli.utils import fleet
+from htbcli.utils import output
+from htbcli.utils.output import emit
+from contextlib import redirect_stdout
+from os.path import expanduser, isdir, isfile, exists, join
 from random import choice
 
 # TODO: Fortresses, Endgames, maybe HBG? (don't even know if I can physically test endgames because skill issue)
-# TODO: Add option to see/search for info about challenges and machines on the platform
 # TODO: Consider changing flags to be more intuitive
 
-def get_args():
+def build_parser():
     # Begin original commands - mostly related to authentication
     parser = argparse.ArgumentParser(
         description="Interact with HackTheBox from the command line.",
-        usage="htbcli [-h] [-c CACHE] [-v] {challenge,machine,vpn} ..."
+        usage="htbcli [-h] [-c CACHE] [--store STORE] [-v] [--no-cache | --refresh] [--no-agent] [--agent-socket PATH] [--profiles FILE] [--output {text,json,ndjson}] {challenge,machine,vpn,status,batch,agent,sync,search} ..."
         )
     parser.add_argument('-c', '--cache', type=str, help='Path to cached credentials.')
+    parser.add_argument('--store', type=str, default=os.environ.get("HTBCLI_STORE", "file"), metavar="STORE", help='Where to keep your login when -c is not given: file (default, ~/.config/htbcli/credentials.json), keyring, encrypted (needs HTBCLI_STORE_PASSPHRASE or asks), optionally :PATH, or none to log in every time.')
     parser.add_argument('-v', '--verbose', action="store_true", help="increase output verbosity")
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument('--no-cache', action="store_true", help="Don't read or write the local challenge/machine metadata cache.")
+    cache_group.add_argument('--refresh', action="store_true", help='Ignore cached challenge/machine metadata and fetch it again.')
+    parser.add_argument('--no-agent', action="store_true", help="Run in this process even if an htbcli agent is running.")
+    parser.add_argument('--agent-socket', type=str, default=agent.DEFAULT_SOCKET, metavar="PATH", help=f'Unix socket of the htbcli agent, to serve on or forward to (default: {agent.DEFAULT_SOCKET}, or HTBCLI_AGENT_SOCKET).')
+    parser.add_argument('--profile', action="store_true", help="Print a timing table of every API call, grouped by phase.")
+    parser.add_argument('--profile-out', type=str, metavar="FILE", help="Write the API call trace to FILE as Chrome trace-event JSON.")
+    parser.add_argument('--profiles', type=str, metavar="FILE", help='Run a machine spawn/stop/reset, vpn download or docker start for every account in FILE (credential cache paths, one per line or a JSON object). {profile} in paths is replaced by the account name.')
+    parser.add_argument('--output', choices=output.MODES, default='text', help='text (default) for people; json prints one document at the end, ndjson one event per line as it happens. Human-readable text goes to stderr in both.')
+    parser.add_argument('--fleet-workers', type=int, default=4, help='How many accounts --profiles works on at once (default: 4).')
     subparsers = parser.add_subparsers(title='subcommands', dest='subcommand')
 
     # Begin challenge subcommand
     parser_chall = subparsers.add_parser('challenge', help="Interact with challenges.")
-    parser_chall.add_argument('-n', '--name', required=True, help='Name of the challenge, or the challenge ID.')
+    parser_chall.add_argument('-n', '--name', help='Name of the challenge, or the challenge ID. Required unless using --bulk.')
     parser_chall.add_argument('-p', '--path', type=str, help='Download challenge files to the specified path.', default=None)
     parser_chall.add_argument('-s', '--start-docker', action="store_true", help='Start Docker instance.')
     parser_chall.add_argument('--stop', action="store_true", help='Stop challenge instance.')
     parser_chall.add_argument('-r', '--reset', action="store_true", help='Stop and then start challenge instance.')
     parser_chall.add_argument('-f', '--flag', type=str, help='Submit flag.')
     parser_chall.add_argument('-d', '--difficulty', type=int, choices=range(10,101), metavar="[10-100]", help='Submit difficulty rating, 10-100.')
+    parser_chall.add_argument('-w', '--wait', action="store_true", help='After starting the Docker instance, wait until it accepts connections.')
+    parser_chall.add_argument('--wait-timeout', type=int, default=300, help='Seconds to wait with --wait (default: 300).')
+    parser_chall.add_argument('--bulk', type=str, metavar="SOURCE", help='Download files for many challenges into the -p directory. SOURCE is a file of names/IDs ("-" for stdin), or "active"/"retired" for the whole list.')
+    parser_chall.add_argument('--workers', type=int, default=4, help='Number of parallel workers for --bulk (default: 4).')
+    parser_chall.add_argument('--category', type=str, help='Only bulk download challenges in this category.')
+    parser_chall.add_argument('--level', type=str, choices=['Easy', 'Medium', 'Hard', 'Insane'], help='Only bulk download challenges of this difficulty.')
 
     # Begin machine subcommand
     parser_mach = subparsers.add_parser('machine', help="Interact with machines.")
     parser_mach.add_argument('-n', '--name', required=True, help='Name of the machine, or the machine ID.')
     parser_mach.add_argument('-s', '--spawn', action="store_true", help='Spawn machine.')
-    parser_mach.add_argument('--release-arena', action="store_true", help='Spawn machine in release arena.')
+    parser_mach.add_argument('--release-arena', action="store_true", help='Spawn, stop or reset the machine in release arena.')
     parser_mach.add_argument('--stop', action="store_true", help='Stop currently assigned machine.')
     parser_mach.add_argument('-r', '--reset', action="store_true", help='Attempt to reset currently assigned machine')
     parser_mach.add_argument('-f', '--flag', type=str, help='Submit flag.')
     parser_mach.add_argument('-d', '--difficulty', type=int, choices=range(10,101), metavar="[10-100]", help='Submit difficulty rating, 10-100.')
+    parser_mach.add_argument('-w', '--wait', action="store_true", help='After spawning/resetting, wait until the machine is up.')
+    parser_mach.add_argument('--wait-ports', type=parse_ports, metavar="PORTS", help='Comma-separated TCP ports that must accept connections before --wait returns, e.g. 22,80.')
+    parser_mach.add_argument('--wait-timeout', type=int, default=300, help='Seconds to wait with --wait (default: 300).')
     
     # Begin VPN subcommands
     parser_vpn = subparsers.add_parser('vpn', help="Manage your VPN connection.")
-    parser_vpn.add_argument('-s', '--switch', type=str, help='Switch currently assigned VPN server. Machine labs only. Pass "menu" to select from menu.')
+    parser_vpn.add_argument('-s', '--switch', type=str, help='Switch currently assigned VPN server. Machine labs only. Pass "menu" to select from menu, or "auto" to pick the fastest server.')
+    parser_vpn.add_argument('--probe-target', type=str, default=None, help='host:port template probed by "--switch auto", with {slug}, {id} and {location} filled in (default: edge-{slug}.hackthebox.eu:443).')
+    parser_vpn.add_argument('--probe-ttl', type=int, default=600, help='Seconds to reuse probe results for (default: 600).')
     parser_vpn.add_argument('--release-arena', action="store_true", help='Work with release arena servers.')
     parser_vpn.add_argument('-t', '--tcp', action="store_true", help='Use TCP instead of UDP for VPN config.')
     parser_vpn.add_argument('-d', '--download', type=str, help='Download your assigned VPN config file to the specified path.', default=None)
 
-    args = parser.parse_args()
+    # Begin status subcommand
+    parser_status = subparsers.add_parser('status', help="Show the active machine, your challenge dockers and VPN server.")
+    parser_status.add_argument('-w', '--watch', action="store_true", help='Keep refreshing until Ctrl+C.')
+    parser_status.add_argument('--interval', type=int, default=10, help='Seconds between checks with --watch, when things are changing (default: 10).')
+    parser_status.add_argument('--max-interval', type=int, default=120, help='Checks slow down to this many seconds while nothing changes (default: 120).')
+    parser_status.add_argument('--release-arena', action="store_true", help='Show the release arena machine instead.')
 
-    return args
+    # Begin batch subcommand
+    parser_batch = subparsers.add_parser('batch', help="Run many challenge/machine/vpn operations in one session.")
+    parser_batch.add_argument('file', nargs='?', default='-', help='JSONL or YAML manifest of operations, "-" (default) reads JSONL from stdin.')
+    parser_batch.add_argument('--stop-on-error', action="store_true", help='Stop at the first operation that fails.')
+
+    # Begin agent subcommand
+    parser_agent = subparsers.add_parser('agent', help="Keep an authenticated session running for other htbcli commands.")
+    parser_agent.add_argument('--stop', action="store_true", help='Stop the agent listening on --agent-socket.')
+
+    # Begin sync subcommand
+    parser_sync = subparsers.add_parser('sync', help="Update the local machine/challenge catalog used by search.")
+    parser_sync.add_argument('--full', action="store_true", help='Pull the retired lists too, even if they are not due yet.')
+    parser_sync.add_argument('--type', choices=['machine', 'challenge'], default=None, help='Only sync machines or challenges.')
+
+    # Begin search subcommand
+    parser_search = subparsers.add_parser('search', help="Search the local catalog offline (run sync first).")
+    parser_search.add_argument('query', nargs='?', default=None, help='Words to match in names and descriptions, prefixes work.')
+    parser_search.add_argument('--type', choices=['machine', 'challenge'], default=None, help='Only show machines or challenges.')
+    parser_search.add_argument('--category', type=str, help='Challenge category, e.g. Crypto.')
+    parser_search.add_argument('--level', type=str, choices=['Easy', 'Medium', 'Hard', 'Insane'], help='Difficulty.')
+    parser_search.add_argument('--os', type=str, help='Machine OS, e.g. Linux.')
+    parser_search.add_argument('--min-points', type=int, help='Only show entries worth at least this many points.')
+    parser_search.add_argument('--max-points', type=int, help='Only show entries worth at most this many points.')
+    solved_group = parser_search.add_mutually_exclusive_group()
+    solved_group.add_argument('--solved', dest='solved', action="store_true", default=None, help='Only show what you have solved/owned.')
+    solved_group.add_argument('--unsolved', dest='solved', action="store_false", help='Only show what you have not solved/owned.')
+    retired_group = parser_search.add_mutually_exclusive_group()
+    retired_group.add_argument('--retired', dest='retired', action="store_true", default=None, help='Only show retired entries.')
+    retired_group.add_argument('--active', dest='retired', action="store_false", help='Only show active entries.')
+    parser_search.add_argument('--limit', type=int, default=25, help='Maximum number of results (default: 25).')
+
+    return parser
+
+def get_args(argv=None):
+    return build_parser().parse_args(argv)
 
 class HTBCLI:
-    def __init__(self) -> None:
-        self.args = get_args()
+    def __init__(self, argv=None) -> None:
+        self.argv = list(argv) if argv is not None else sys.argv[1:]
+        self.args = get_args(self.argv)
         # print(f"[ DEBUG ] args={self.args}")
 
-        if self.args == argparse.Namespace(cache=None, subcommand=None, verbose=False):
+        if self.args.subcommand is None:
             print(recc + "Use the -h/--help flag for basic help information.")
             exit()
 
-        if self.args.verbose:
-            self.print_args()
-
         self.subcommand = self.args.subcommand
-        
-        if self.subcommand != 'vpn' and self.subcommand is not None:
-            if self.args.name.isdecimal():
+        self._metadata = None
+        self.tracer = Tracer()
+        self.profiling = self.args.profile or self.args.profile_out is not None
+        self.forwarded = False
+        # Whether a login may prompt, fleet workers have no terminal to ask on
+        self.interactive = True
+        self.normalize_name()
+
+    def report(self, run) -> int:
+        """Call run() with events going to this invocation's --output format, returns the exit code"""
+        from contextlib import ExitStack
+        emitter = output.Emitter(self.args.output, sys.stdout)
+        output.set_emitter(emitter)
+        code = output.EXIT_OK
+        try:
+            with ExitStack() as stack:
+                if self.args.output != 'text':
+                    # Keep stdout for the JSON, everything else is for people
+                    stack.enter_context(redirect_stdout(sys.stderr))
+                run()
+        except SystemExit as e:
+            code = e.code
+        except KeyboardInterrupt:
+            print("\n" + info + "Exiting...", file=sys.stderr)
+            code = 130
+        except Exception as e:
+            from hackthebox import errors
+            if not isinstance(e, errors.RateLimitException):
+                raise
+            emitter.emit("error", important + "HackTheBox is still rate limiting us after several retries. "
+                                            + "Please wait a minute before issuing another command.",
+                         level="error", reason="rate_limited")
+            code = output.EXIT_RATE_LIMITED
+        code = emitter.exit_code(code)
+        if not self.forwarded:
+            emitter.finish(code)
+        return code
+
+    def account_dir(self):
+        """Cache directory for this login, None if we can't tell whose login it is"""
+        identity = self.credential_identity()
+        if identity is None and getattr(self, "username", None):
+            identity = "login:" + self.username.lower()
+        return account_dir(identity) if identity is not None else None
+
+    @property
+    def metadata(self) -> MetadataCache:
+        """Challenge/machine cache for this account, their profiles carry per-account solves and IPs"""
+        if self._metadata is None:
+            directory = self.account_dir()
+            self._metadata = MetadataCache(join(directory, "metadata.json") if directory else None,
+                                           enabled=directory is not None and not self.args.no_cache,
+                                           refresh=self.args.refresh)
+        return self._metadata
+
+    def docker_tracker(self):
+        from htbcli.utils.instances import DockerTracker
+        directory = self.account_dir()
+        return DockerTracker(join(directory, "dockers.json") if directory else None)
+
+    def catalog(self):
+        """This account's catalog, its solved column differs per login. None if we can't tell whose login it is"""
+        from htbcli.utils.catalog import Catalog
+        directory = self.account_dir()
+        return Catalog(join(directory, "catalog.db")) if directory else None
+
+    def phase(self, name: str):
+        """Context manager attributing API calls to a phase of the command for --profile"""
+        return self.tracer.phase(name)
+
+    def normalize_name(self):
+        """Numeric names are challenge/machine IDs"""
+        if self.subcommand in ('challenge', 'machine'):
+            if isinstance(self.args.name, str) and self.args.name.isdecimal():
                 self.args.name = int(self.args.name)
 
     def run(self):
-        """Executes the specified subcommand"""
+        """Executes the specified subcommand, on a running agent if there is one"""
+        if self.subcommand == 'agent':
+            self.agent()
+            return
+        # Search never touches the API, so it doesn't need a login
+        if self.subcommand == 'search':
+            self.search()
+            return
+        if self.args.profiles is not None:
+            self.fleet()
+            return
+        if self.forward_to_agent():
+            return
+
+        if self.args.verbose:
+            self.print_args()
+        with self.phase("auth"):
+            self.cred_management()
+        self.execute()
+
+    def execute(self):
+        """Executes the specified subcommand with an already authenticated client"""
+        previous_tracer = self.client.tracer
+        if self.profiling:
+            self.client.tracer = self.tracer
+        try:
+            if self.subcommand == 'batch':
+                self.batch()
+            elif self.subcommand == 'sync':
+                with self.phase("sync"):
+                    self.sync()
+            else:
+                self.dispatch()
+        finally:
+            self.client.tracer = previous_tracer
+            if self.profiling:
+                self.report_profile()
+
+        self.metadata.save()
+        if self.args.verbose:
+            print(info + self.metadata.stats())
+
+    def report_profile(self):
+        """Print and/or write out the --profile trace"""
+        if self.args.profile:
+            self.tracer.print_summary()
+        if self.args.profile_out is not None:
+            try:
+                self.tracer.write(expanduser(self.args.profile_out))
+                print(info + f"Trace written to {self.args.profile_out}", file=sys.stderr)
+            except OSError as e:
+                print(printError + f"Couldn't write trace: {e}", file=sys.stderr)
+
+    def forward_to_agent(self) -> bool:
+        """Hand this invocation to a running agent. Returns False if we should run it ourselves"""
+        if self.args.no_agent or not agent.agent_supported():
+            return False
+        # Anything that reads from our terminal has to run here
+        if self.subcommand == 'batch' and self.args.file == '-':
+            return False
+        if self.subcommand == 'challenge' and self.args.bulk == '-':
+            return False
+        if self.subcommand == 'vpn' and self.args.switch is not None and self.args.switch.lower() == 'menu':
+            return False
+        # A watch would keep the agent busy for as long as it runs
+        if self.subcommand == 'status' and self.args.watch:
+            return False
+        identity = self.credential_identity()
+        if identity is None:
+            # A login typed in here could be anyone's
+            return False
+        code = agent.forward(self.argv, self.args.agent_socket, output.get_emitter().stream, identity)
+        if code is None:
+            return False
+        # The agent already printed the whole report, including --output json/ndjson
+        self.forwarded = True
+        if code:
+            sys.exit(code)
+        return True
+
+    def credential_identity(self):
+        """Which saved login this invocation uses (-c path or --store), or None if it asks for one"""
+        from htbcli.utils.credentials import store_identity
+        if self.args.cache is not None:
+            return "cache:" + os.path.realpath(expanduser(self.args.cache))
+        if self.args.store == 'none':
+            return None
+        return "store:" + store_identity(self.args.store)
+
+    def agent(self):
+        """Authenticate once, then serve other htbcli invocations over a Unix socket"""
+        if not agent.agent_supported():
+            emit("error", printError + "The agent needs Unix socket support, which this platform doesn't have.")
+            exit()
+        if self.args.stop:
+            if agent.shutdown(self.args.agent_socket):
+                print(good + "Agent stopped.")
+            else:
+                print(important + f"No agent is listening on {self.args.agent_socket}.")
+            return
+        if self.credential_identity() is None:
+            emit("error", printError + "The agent needs a saved login to tell callers apart, use -c or --store.")
+            exit()
+
         self.cred_management()
+        try:
+            server = agent.AgentServer(self.args.agent_socket, self.run_forwarded, self.credential_identity())
+        except OSError as e:
+            emit("error", printError + f"Couldn't start the agent: {e}")
+            exit()
+        print(good + f"Agent listening on {server.socket_path}, stop it with Ctrl+C or 'htbcli agent --stop'.")
+        # Keep the session alive between commands so none of them waits on a refresh
+        refresher = self.client.keep_fresh()
+        try:
+            server.serve_forever()
+        finally:
+            refresher.set()
+            server.server_close()
+
+    def run_forwarded(self, argv: list):
+        """Runs one invocation received by the agent, reusing the agent's client"""
+        h = HTBCLI(argv)
+        if h.subcommand == 'agent':
+            print(important + "An agent is already running.")
+            return
+        if h.args.verbose:
+            h.print_args()
+        h.client = self.client
+        code = h.report(h.execute)
+        if code:
+            sys.exit(code)
+
+    def fleet(self):
+        """Runs this command once per account in --profiles on a bounded pool, then prints a status table"""
+        from concurrent.futures import ThreadPoolExecutor
+        from htbcli.utils.capture import capture
+        try:
+            profiles = fleet.load_profiles(self.args.profiles)
+        except (OSError, ValueError) as e:
+            emit("error", printError + f"Couldn't read profiles: {e}")
+            print(info + "Exiting...")
+            exit()
+        problem = fleet.check_fleet_args(self.args, len(profiles))
+        if problem is not None:
+            emit("error", printError + problem)
+            exit()
+
+        def run_profile(name, cache):
+            result = {"profile": name, "ok": True}
+            start = time.perf_counter()
+            emitter = output.Emitter()
+            output.set_emitter(emitter, thread_only=True)
+            with capture() as captured:
+                try:
+                    if not isfile(cache):
+                        raise FileNotFoundError(f"no credential cache at {cache}")
+                    h = HTBCLI(fleet.profile_argv(self.argv, name, cache))
+                    # Prompts would land in the captured output and wait on stdin with nothing on screen
+                    h.interactive = False
+                    # Every account gets its own metadata cache and docker list (see account_dir)
+                    h.cred_management()
+                    h.dispatch()
+                    h.metadata.save()
+                except SystemExit:
+                    result["ok"] = False
+                except Exception as e:
+                    result["ok"] = False
+                    emit("error", printError + f"We encountered an error: {str(e) or type(e).__name__}")
+            output.set_emitter(None, thread_only=True)
+            result["ok"] = result["ok"] and not emitter.failed
+            result["seconds"] = time.perf_counter() - start
+            result["output"] = captured.getvalue()
+            result["detail"] = fleet.summarize(result["output"])
+            result["events"] = emitter.events
+            return result
+
+        print(info + f"Running {self.subcommand} for {len(profiles)} account(s)...")
+        with ThreadPoolExecutor(max_workers=max(1, self.args.fleet_workers)) as pool:
+            results = list(pool.map(lambda p: run_profile(*p), profiles.items()))
+
+        if self.args.verbose:
+            for r in results:
+                print(f"── {r['profile']} " + '─'*(46 - len(r['profile'])))
+                print(r["output"], end='')
+        for r in results:
+            emit("account", level="info" if r["ok"] else "error",
+                 **{k: r[k] for k in ("profile", "ok", "seconds", "detail", "events")})
+        fleet.print_table(results)
+        failed = sum(not r["ok"] for r in results)
+        print((good if not failed else important) + f"{len(results) - failed}/{len(results)} account(s) succeeded.")
+        if failed:
+            sys.exit(1)
+
+    def dispatch(self):
+        """Runs the current challenge/machine/vpn subcommand against the already authenticated client"""
+        if self.subcommand in ('challenge', 'machine') and (self.args.flag is None) != (self.args.difficulty is None):
+            emit("error", printError + "You need a flag and a difficulty to submit!", reason="usage")
+            sys.exit(output.EXIT_USAGE)
+        with self.phase("lookup"):
+            self.resolve_name()
         if self.subcommand == 'challenge':
             self.challenge()
         elif self.subcommand == 'machine':
             self.machine()
         elif self.subcommand == 'vpn':
             self.vpn()
+        elif self.subcommand == 'status':
+            self.status()
+
+    def batch(self):
+        """Runs every operation in the manifest with the same client, reporting one JSON line per operation"""
+        from hackthebox import errors
+        batch_args = self.args
+        try:
+            ops = load_manifest(batch_args.file)
+        except (OSError, ValueError) as e:
+            emit("error", printError + f"Couldn't read manifest: {e}")
+            print(info + "Exiting...")
+            exit()
+
+        parser = build_parser()
+        ran = failed = 0
+        for i, op in enumerate(ops):
+            result = {"index": i, "op": op, "ok": True}
+            start = time.perf_counter()
+            # Connectors report most failures as error events rather than raising
+            seen = len(output.get_emitter().events)
+            # Keep the human-readable output off stdout so the report stays parseable
+            with redirect_stdout(sys.stderr):
+                try:
+                    self.args = parser.parse_args(op_to_argv(op))
+                    for key in ('cache', 'store', 'verbose', 'no_cache', 'refresh', 'output'):
+                        setattr(self.args, key, getattr(batch_args, key))
+                    self.subcommand = self.args.subcommand
+                    self.normalize_name()
+                    self.dispatch()
+                except SystemExit as e:
+                    result["ok"] = False
+                    result["error"] = f"aborted (exit code {e.code})" if e.code else "aborted"
+                except errors.RateLimitException as e:
+                    result["ok"] = False
+                    result["error"] = f"rate limited: {e}"
+                except Exception as e:
+                    result["ok"] = False
+                    result["error"] = str(e) or type(e).__name__
+            reported = [e for e in output.get_emitter().events[seen:] if e["level"] == "error"]
+            if reported and result["ok"]:
+                result["ok"] = False
+                result["error"] = reported[0].get("message") or reported[0]["event"]
+            result["seconds"] = round(time.perf_counter() - start, 3)
+            emit("batch_result", level="info" if result["ok"] else "error", **result)
+            if batch_args.output == 'text':
+                print(json.dumps(result), flush=True)
+            ran += 1
+            if not result["ok"]:
+                failed += 1
+                if batch_args.stop_on_error:
+                    break
+
+        self.args = batch_args
+        self.subcommand = 'batch'
+        print(info + f"Batch finished: {ran - failed} ok, {failed} failed, {len(ops) - ran} skipped.", file=sys.stderr)
+
+    def sync(self):
+        """Bring the local catalog (and the name index with it) up to date"""
+        kinds = [self.args.type] if self.args.type else ["machine", "challenge"]
+        catalog = self.catalog()
+        if catalog is None:
+            emit("error", printError + "Can't tell which account this login is, so there's no catalog to sync into.")
+            return
+        index = NameIndex()
+        print(info + "Syncing local catalog...")
+        try:
+            stats = catalog.sync(self.client, kinds, self.args.full, index)
+        except Exception as e:
+            emit("error", printError + f"We encountered an error: {e}")
+            return
+        finally:
+            index.save()
+            catalog.close()
+        emit("synced", good + f"Catalog synced: {stats['added']} new, {stats['updated']} updated, "
+                            + f"{stats['retired']} newly retired ({stats['fetched']} entries fetched).", **stats)
+
+    def search(self):
+        """Query the local catalog with the search filters, no API calls involved"""
+        catalog = self.catalog()
+        if catalog is None:
+            emit("error", printError + "Search uses the catalog of a saved login, pass -c CACHE or --store.", reason="usage")
+            sys.exit(output.EXIT_USAGE)
+        try:
+            if not catalog.count():
+                print(important + "The local catalog for this login is empty, run 'htbcli sync' with the same -c/--store first.")
+                return
+            results = catalog.search(self.args.query, self.args.type, self.args.category, self.args.level,
+                                     self.args.os, self.args.min_points, self.args.max_points,
+                                     self.args.solved, self.args.retired, self.args.limit)
+        finally:
+            catalog.close()
+        if not results:
+            print(important + "Nothing matched.")
+            return
+        print(f"{'type':<10} {'id':>6}  {'name':<28} {'category/os':<14} {'level':<8} {'pts':>4}  {'solved':<6} {'retired':<7}")
+        for r in results:
+            emit("result", **{k: r[k] for k in r.keys() if k != "digest"})
+            print(f"{r['kind']:<10} {r['id']:>6}  {r['name'][:28]:<28} {(r['category'] or r['os'] or '-')[:14]:<14} "
+                  f"{(r['difficulty'] or '-'):<8} {(r['points'] or 0):>4}  {'yes' if r['solved'] else 'no':<6} "
+                  f"{'yes' if r['retired'] else 'no':<7}")
+        print(info + f"{len(results)} result(s)" + (" (limit reached)" if len(results) == self.args.limit else ""))
+
+    def resolve_name(self):
+        """Turn a machine/challenge name into an ID using the local name index.
+
+        Only exact names are trusted as they are, anything looser syncs a stale
+        index first and is refused for actions that change something, since a
+        new release can share a prefix with a box the index already knows.
+        """
+        if self.subcommand not in ('challenge', 'machine') or not isinstance(self.args.name, str) or self.args.no_cache:
+            return
+        if self.subcommand == 'machine' and set(self.machine_actions()) <= {"stop", "reset"}:
+            # Stop and reset act on whatever is assigned, the name is never looked up
+            return
+        index = NameIndex()
+        match = index.exact(self.subcommand, self.args.name)
+        if match is None and index.stale(self.subcommand):
+            print(info + f"Updating local {self.subcommand} index...")
+            try:
+                index.sync(self.client, self.subcommand)
+                index.save()
+            except Exception as e:
+                print(important + f"Couldn't update the {self.subcommand} index: {e}")
+            match = index.exact(self.subcommand, self.args.name)
+        if match is None:
+            match = index.resolve(self.subcommand, self.args.name)
+            if match is not None and self.changes_state():
+                candidates = index.candidates(self.subcommand, self.args.name)
+                emit("error", printError + f"'{self.args.name}' isn't the exact name of a {self.subcommand}, did you mean "
+                     + ", ".join(candidates) + "? Use the full name or the ID.",
+                     reason="ambiguous_name", query=self.args.name, candidates=candidates)
+                sys.exit(output.EXIT_USAGE)
+        if match is not None:
+            if self.args.verbose or match[1].lower() != self.args.name.lower():
+                emit("resolved", info + f"Resolved '{self.args.name}' to {match[1]} (ID {match[0]})",
+                     query=self.args.name, id=match[0], name=match[1])
+            self.args.name = match[0]
+
+    def changes_state(self) -> bool:
+        """Whether the challenge/machine command does more than look things up"""
+        if self.subcommand == 'machine':
+            return self.machine_actions() != ["info"]
+        return bool(self.args.start_docker or self.args.stop or self.args.reset or self.args.flag is not None)
 
     def print_args(self):
         """Print passed arguments to be more verbose"""
@@ -92,19 +576,47 @@ class HTBCLI:
 
     def cred_management(self):
         """Applies flags to authenticate with the API, either through input or caching."""
+        from hackthebox import errors
+        from hackthebox.constants import API_BASE
+        from htbcli.connectors.client import SessionClient
+        api_base = os.environ.get("HTBCLI_API_BASE", API_BASE)
+        tracer = self.tracer if self.profiling else None
         
+        # No cache given, use the credential store so only the first run asks for a password
+        if self.args.cache is None and self.args.store != 'none':
+            from htbcli.utils.credentials import CredentialStore
+            try:
+                store = CredentialStore.from_spec(self.args.store)
+                saved = store.load() is not None
+            except (ValueError, OSError) as e:
+                emit("error", printError + f"Couldn't open the credential store: {e}")
+                print(info + "Exiting...")
+                exit()
+            if not saved:
+                print(info + f"Logging in, your session will be saved to {store.describe()}")
+                self.username = input(recc + 'Email: ')
+                self.password = getpass.getpass(recc + 'Password: ')
+            else:
+                self.username = self.password = None
+            try:
+                self.client = SessionClient(email=self.username, password=self.password, cache=store, api_base=api_base, tracer=tracer,
+                                            interactive=self.interactive)
+            except Exception as e:
+                emit("error", printError + f"Couldn't authenticate: {e}")
+                print(info + "Exiting...")
+                exit()
         # If the user wants to input creds directly
-        if self.args.cache is None:
+        elif self.args.cache is None:
             self.username = input(recc + 'Email: ')
             self.password = getpass.getpass(recc + 'Password: ')
             try:
-                self.client = HTBClient(email=self.username, password=self.password)
+                self.client = SessionClient(email=self.username, password=self.password, api_base=api_base, tracer=tracer)
             except errors.ApiError as e:
-                print(printError + f"Couldn't authenticate: {e}")
+                emit("error", printError + f"Couldn't authenticate: {e}")
                 print(info + "Exiting...")
                 exit()
             except AttributeError as e:
-                print(printError + f"Couldn't authenticate: {e}")
+                emit("error", printError + f"Couldn't authenticate: {e}")
                 print(info + "Exiting...")
                 exit()
         # If the path given to the cache is invalid
@@ -114,93 +626,166 @@ class HTBCLI:
             self.password = getpass.getpass(recc + 'Password: ')
             try:
                 if cache_choice.lower() == 'y':
-                    self.client = HTBClient(email=self.username, password=self.password, cache=expanduser(self.args.cache))
+                    self.client = SessionClient(email=self.username, password=self.password, cache=expanduser(self.args.cache), api_base=api_base, tracer=tracer)
                 else:
-                    self.client = HTBClient(email=self.username, password=self.password)
+                    self.client = SessionClient(email=self.username, password=self.password, api_base=api_base, tracer=tracer)
             except Exception as e:
-                print(printError + f"We encountered an error: {e}")
+                emit("error", printError + f"We encountered an error: {e}")
                 print(info + "Exiting...")
                 exit()
         # The cache exists
         else:
             try:
-                self.client = HTBClient(cache=expanduser(self.args.cache))
+                self.client = SessionClient(cache=expanduser(self.args.cache), api_base=api_base, tracer=tracer,
+                                            interactive=self.interactive)
+            except errors.AuthenticationException as e:
+                emit("error", printError + f"Couldn't authenticate: {e}")
+                print(info + "Exiting...")
+                exit()
             except json.decoder.JSONDecodeError:
-                print(printError + f"Encountered an error reading {expanduser(self.args.cache)}. Please check if the " +
+                emit("error", printError + f"Encountered an error reading {expanduser(self.args.cache)}. Please check if the " +
                             "file is valid JSON, or delete the cache file and rerun this program" + 
                             " to create a new one.")
                 print(info + "Exiting...")
                 exit()
             except AttributeError as e:
-                print(printError + f"Couldn't authenticate: {e}")
+                emit("error", printError + f"Couldn't authenticate: {e}")
                 print(info + "Exiting...")
                 exit()
             except IsADirectoryError:
-                print(printError + "Specified cache file is a directory")
+                emit("error", printError + "Specified cache file is a directory")
                 print(info + "Exiting...")
                 exit()
         
     def challenge(self):
         """Facilitates interactions with the challenges. TODO: Move to separate class/file"""
+        from htbcli.connectors.challenge import ChallengeInterface
+        if self.args.bulk is not None:
+            if self.args.path is None:
+                emit("error", printError + "--bulk needs a directory to download to (-p/--path).")
+                exit()
+            from htbcli.connectors.bulk import BulkDownloader
+            bulk = BulkDownloader(self.client, self.args.path, self.args.workers, self.metadata,
+                                  self.args.category, self.args.level)
+            with self.phase("download"):
+                bulk.run(self.args.bulk)
+            return
+        if self.args.name is None:
+            emit("error", printError + "You need to pass a challenge with -n/--name (or use --bulk).")
+            exit()
+
         # Attempt to access the challenge to return a Challenge object
-        chall_interface = ChallengeInterface(self.client, self.args.name)
+        with self.phase("lookup"):
+            chall_interface = ChallengeInterface(self.client, self.args.name, self.metadata, self.docker_tracker())
         
-        # If the user has specified they want to download the files, download the files
+        # Download, docker and submission don't depend on each other, so they run side by side.
+        # Docker actions run in the order given: start, stop, then reset (stop before start)
+        pipeline = Pipeline(self.tracer)
         if self.args.path is not None and chall_interface.chall.has_download:
-            chall_interface.download_chall_files(self.args.path)
-
-        # Spawn docker assuming the challenge has docker
-        if self.args.start_docker and chall_interface.chall.has_docker:
-            chall_interface.spawn_docker()
+            pipeline.add("download", chall_interface.download_chall_files, self.args.path, phase="download")
 
-        if self.args.stop and chall_interface.chall.has_docker:
-            chall_interface.stop_instance()
-
-        if self.args.reset and chall_interface.chall.has_docker:
-            chall_interface.stop_instance()
-            chall_interface.spawn_docker()
+        docker = []
+        if chall_interface.chall.has_docker:
+            if self.args.start_docker:
+                docker.append(("docker start", self.start_docker, chall_interface))
+            if self.args.stop:
+                docker.append(("docker stop", chall_interface.stop_instance))
+            if self.args.reset:
+                docker.append(("reset stop", chall_interface.stop_instance))
+                docker.append(("reset start", self.start_docker, chall_interface))
+        previous = []
+        for name, func, *args in docker:
+            pipeline.add(name, func, *args, after=previous)
+            previous = [name]
 
         # submit flag and difficulty rating, both are required for a valid submission
         if self.args.flag is not None and self.args.difficulty is not None:
-            chall_interface.attempt_submission(self.args.flag, self.args.difficulty)
-        elif (self.args.flag is None) != (self.args.difficulty is None):
-            print(important + "You need a flag and a difficulty to submit!")
+            pipeline.add("submit", chall_interface.attempt_submission, self.args.flag, self.args.difficulty)
+
+        pipeline.run()
+        pipeline.timeline()
+
+    def start_docker(self, chall_interface):
+        """Start the challenge docker and wait for it if asked to"""
+        started = time.monotonic()
+        addr = chall_interface.spawn_docker()
+        if self.args.wait and addr:
+            chall_interface.wait_for_docker(addr, self.args.wait_timeout, started)
+
+    def machine_actions(self) -> list:
+        """The machine actions asked for, in the order they run"""
+        wanted = (("spawn", self.args.spawn), ("flag", self.args.flag is not None and self.args.difficulty is not None),
+                  ("stop", self.args.stop), ("reset", self.args.reset))
+        return [action for action, on in wanted if on] or ["info"]
 
-        
     def machine(self):
         """Facilitates interactions with the machines. TODO: Move to separate class/file"""
-        # Pull down the machine object
-        machine = MachineInterface(self.client, self.args.name)
+        from htbcli.connectors.machine import MachineInterface
+        # Pull down only what the requested actions need
+        with self.phase("lookup"):
+            machine = MachineInterface(self.client, self.args.name, self.metadata)
+            machine.prepare(self.machine_actions())
 
         # attempt to spawn the machine either normally or in release arena
         if self.args.spawn:
-            machine.spawn_machine(self.args.release_arena)
+            with self.phase("action"):
+                started = time.monotonic()
+                ip = machine.spawn_machine(self.args.release_arena)
+                if self.args.wait and ip:
+                    machine.wait_until_ready(self.args.release_arena, self.args.wait_ports, self.args.wait_timeout, started)
 
         # submit flag and difficulty rating, both are required for a valid submission
         if self.args.flag is not None and self.args.difficulty is not None:
-            machine.attempt_submission(self.args.flag, self.args.difficulty)
-        elif (self.args.flag is None) != (self.args.difficulty is None):
-            print(important + "You need a flag and a difficulty to submit!")
+            with self.phase("action"):
+                machine.attempt_submission(self.args.flag, self.args.difficulty)
 
         if self.args.stop:
-            machine.stop_instance()
+            with self.phase("action"):
+                machine.stop_instance(self.args.release_arena)
 
         if self.args.reset:
-            machine.reset_instance()
+            with self.phase("action"):
+                ip = machine.reset_instance(self.args.release_arena)
+                if self.args.wait and ip:
+                    machine.wait_after_reset(ip, self.args.wait_ports, self.args.wait_timeout)
 
     def vpn(self):
         """Manage VPN connections using specified flags."""
+        from htbcli.connectors.vpn import VpnInterface
+        from htbcli.utils.vpncache import VpnConfigCache
         ra = self.args.release_arena
-        vpn_interface = VpnInterface(self.client, self.args.switch, ra)
+        # Configs hold this account's key, so they're cached per account
+        directory = self.account_dir()
+        configs = VpnConfigCache(join(directory, "vpn") if directory else None,
+                                 enabled=directory is not None and not self.args.no_cache, refresh=self.args.refresh)
+        vpn_interface = VpnInterface(self.client, self.args.switch, ra, configs)
 
         # If the user specified a switch, try to switch to server
         # If the switch is specified but there's no server, open a menu
-        if self.args.switch is not None:
-            vpn_interface.switch_servers(self.args.switch)
+        if self.args.switch is not None and self.args.switch.lower() == 'auto':
+            from htbcli.utils.probe import DEFAULT_TARGET
+            with self.phase("action"):
+                vpn_interface.auto_switch(self.args.probe_target or DEFAULT_TARGET, self.args.probe_ttl)
+        elif self.args.switch is not None:
+            with self.phase("action"):
+                vpn_interface.switch_servers(self.args.switch)
 
         # Download the VPN file
         if self.args.download is not None:
-            vpn_interface.download_vpn(self.args.download, self.args.tcp)
+            with self.phase("download"):
+                vpn_interface.download_vpn(self.args.download, self.args.tcp)
+
+    def status(self):
+        """Show (or with --watch, keep showing) what's running"""
+        from htbcli.connectors.status import StatusInterface
+        status = StatusInterface(self.client, self.args.release_arena, self.docker_tracker())
+        if self.args.watch:
+            with self.phase("watch"):
+                status.watch(max(1, self.args.interval), max(self.args.interval, self.args.max_interval))
+            return
+        with self.phase("lookup"):
+            snap = status.snapshot()
+        status.show(snap, True)
 
 def main():
     flavortext = [
@@ -222,16 +807,11 @@ def main():
         "szymex/xct/Jazz probably already blooded it"
     ]
 
-    print(f'\n\033[92mhtbcli - version v0.2 | "{choice(flavortext)}"\033[0m')
-    print('\033[35mauthor: @An00bRektn (an00brektn.github.io)\033[0m')
+    # Banner goes to stderr so stdout stays clean for batch reports
+    print(f'\n\033[92mhtbcli - version v0.2 | "{choice(flavortext)}"\033[0m', file=sys.stderr)
+    print('\033[35mauthor: @An00bRektn (an00brektn.github.io)\033[0m', file=sys.stderr)
     h = HTBCLI()
-    try:
-        h.run()
-    except KeyboardInterrupt:
-        print("\n" + info + "Exiting...")
-    except errors.RateLimitException:
-        print(important + "You might be making too many requests. " 
-                        + "Please wait at least 30 seconds before issuing another command.")
+    sys.exit(h.report(h.run))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from os.path import expanduser, join, isfile, getsize
+
+from hackthebox import *
+from htbcli.utils.cache import MetadataCache
+from htbcli.utils.colors import *
+from htbcli.utils.download import download_challenge
+from htbcli.utils.output import emit
+
+MANIFEST_NAME = ".htbcli-downloads.json"
+MAX_ATTEMPTS = 5
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_targets(source: str) -> list:
+    """Challenge IDs/names from a file (one per line, '-' for stdin)"""
+    if source == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(expanduser(source), 'r') as f:
+            lines = f.read().splitlines()
+    targets = []
+    for line in lines:
+        line = line.split('#', 1)[0].strip()
+        if line:
+            targets.append(int(line) if line.isdecimal() else line)
+    return targets
+
+
+class BulkDownloader:
+    """Downloads files for many challenges into one directory with a bounded worker pool.
+
+    Lookups, skip checks and hashing run in parallel. The transfers themselves
+    are still paced by the client's challenge download cooldown, which we wait
+    out (with jittered backoff) instead of failing on RateLimitException.
+    """
+    def __init__(self, client: HTBClient, directory: str, workers=4, cache: MetadataCache = None,
+                 category=None, level=None) -> None:
+        self.client = client
+        self.directory = expanduser(directory)
+        self.workers = max(1, workers)
+        self.cache = cache
+        self.category = category.lower() if category else None
+        self.level = level.lower() if level else None
+        self.manifest_path = join(self.directory, MANIFEST_NAME)
+        self.manifest = {}
+        self.claimed = set()
+        self.lock = threading.Lock()
+        self.download_gate = threading.Lock()
+
+    def list_targets(self, source: str) -> list:
+        """Resolve the --bulk source: a file of IDs/names, or 'active'/'retired' for the whole list"""
+        if source in ('active', 'retired'):
+            return [c.id for c in self.client.get_challenges(retired=source == 'retired')
+                    if self.level is None or c.difficulty.lower() == self.level]
+        return read_targets(source)
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r') as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {}
+
+    def save_manifest(self):
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, self.manifest_path)
+
+    def already_have(self, filename: str) -> bool:
+        """A file counts as downloaded if it matches the size and hash we recorded for it"""
+        path = join(self.directory, filename)
+        record = self.manifest.get(filename)
+        if record is None or not isfile(path) or getsize(path) != record["size"]:
+            return False
+        return sha256_file(path) == record["sha256"]
+
+    def fetch(self, target):
+        """Worker: look up one challenge and download its files. Returns (status, name, bytes)"""
+        if self.cache is not None:
+            chall = self.cache.get_challenge(self.client, target)
+        else:
+            chall = self.client.get_challenge(target)
+        if self.category is not None and chall.category.lower() != self.category:
+            return "filtered", chall.name, 0
+        if self.level is not None and chall.difficulty.lower() != self.level:
+            return "filtered", chall.name, 0
+        if not chall.has_download:
+            return "no files", chall.name, 0
+
+        filename = f"{chall.name}.zip"
+        with self.lock:
+            if filename in self.claimed:
+                return "duplicate", chall.name, 0
+            self.claimed.add(filename)
+        if self.already_have(filename):
+            return "skipped", chall.name, 0
+
+        path = join(self.directory, filename)
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            with self.download_gate:
+                wait = self.client.challenge_cooldown - time.time()
+                if wait > 0:
+                    time.sleep(wait + random.uniform(0, 1))
+                try:
+                    _, size, sha256 = download_challenge(self.client, chall, path, progress=False)
+                    break
+                except errors.RateLimitException:
+                    if attempt == MAX_ATTEMPTS:
+                        raise
+                    time.sleep(min(60, 2 ** attempt) + random.uniform(0, 1))
+
+        with self.lock:
+            self.manifest[filename] = {"id": chall.id, "size": size, "sha256": sha256}
+            self.save_manifest()
+        return "downloaded", chall.name, size
+
+    def run(self, source: str):
+        os.makedirs(self.directory, exist_ok=True)
+        self.load_manifest()
+        try:
+            targets = self.list_targets(source)
+        except Exception as e:
+            emit("error", printError + f"Couldn't read bulk targets: {e}")
+            return
+        emit("progress", info + f"Fetching files for {len(targets)} challenge(s) into {self.directory} with {self.workers} worker(s)...")
+
+        counts = {}
+        total_bytes = 0
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self.fetch, t): t for t in targets}
+            for future in as_completed(futures):
+                target = futures[future]
+                try:
+                    status, name, size = future.result()
+                except errors.NotFoundException:
+                    status, name, size = "failed", target, 0
+                    emit("bulk_item", printError + f"Could not find challenge {target}.", target=target, status=status)
+                except Exception as e:
+                    status, name, size = "failed", target, 0
+                    emit("bulk_item", printError + f"{target}: we encountered an error: {e}", target=target, status=status)
+                else:
+                    if status == "downloaded":
+                        emit("bulk_item", good + f"{name} ({size / 1024:.1f} KiB)", target=target, name=name,
+                             status=status, bytes=size)
+                    elif status != "filtered":
+                        emit("bulk_item", info + f"{name}: {status}", target=target, name=name, status=status)
+                counts[status] = counts.get(status, 0) + 1
+                total_bytes += size
+        elapsed = time.perf_counter() - start
+
+        if self.cache is not None:
+            self.cache.save()
+        summary = ", ".join(f"{n} {s}" for s, n in sorted(counts.items()))
+        rate = total_bytes / elapsed / (1024 * 1024) if elapsed > 0 else 0
+        emit("bulk_done", good + f"Bulk download finished in {elapsed:.1f}s: {summary or 'nothing to do'}",
+             counts=counts, bytes=total_bytes, seconds=round(elapsed, 3))
+        emit("progress", f"  \\\\--> {total_bytes / (1024 * 1024):.2f} MiB @ {rate:.2f} MiB/s")
@@ -1,75 +1,120 @@
 #!/usr/bin/env python3
+import time
+
 from hackthebox import *
+from htbcli.utils.cache import MetadataCache
 from htbcli.utils.colors import *
+from htbcli.utils.download import download_challenge
+from htbcli.utils.output import emit
+from htbcli.utils.instances import DockerTracker
+from htbcli.utils import readiness
 from os.path import expanduser, isdir, isfile, exists
 
 
 class ChallengeInterface:
-    def __init__(self, client: HTBClient, name) -> None:
+    def __init__(self, client: HTBClient, name, cache: MetadataCache = None, tracker: DockerTracker = None) -> None:
         self.client = client
         self.name = name
-        print(info + f'Accessing challenge {self.name}...')
+        self.cache = cache
+        self.tracker = tracker if tracker is not None else DockerTracker()
+        emit("lookup", info + f'Accessing challenge {self.name}...')
         try:
-            self.chall = self.client.get_challenge(self.name)
+            if self.cache is not None:
+                self.chall = self.cache.get_challenge(self.client, self.name)
+            else:
+                self.chall = self.client.get_challenge(self.name)
         except errors.NotFoundException:
-            print(printError + "Could not find challenge. Exiting...")
+            emit("error", printError + "Could not find challenge. Exiting...", reason="not_found")
             exit()
-        print(good + f"Challenge {self.chall.name} ({self.chall.category}) retrieved!")
+        emit("challenge", good + f"Challenge {self.chall.name} ({self.chall.category}) retrieved!",
+             id=self.chall.id, name=self.chall.name, category=self.chall.category, difficulty=self.chall.difficulty,
+             points=self.chall.points, solved=self.chall.solved, docker=self.chall.has_docker,
+             download=self.chall.has_download)
+
+    def forget(self):
+        """Drop the cached copy of this challenge after changing its state"""
+        if self.cache is not None:
+            self.cache.invalidate("challenge", self.chall.id)
+
+    def download(self, path: str):
+        """Stream the challenge zip to path, resuming a previous partial download if there is one"""
+        path, size, sha256 = download_challenge(self.client, self.chall, path)
+        emit("download", info + f"{size / 1024:.1f} KiB, sha256 {sha256}", path=path, bytes=size, sha256=sha256)
 
     def download_chall_files(self, path: str):
         if self.chall.has_download:
             path = expanduser(path)
-            print(info + f'Downloading challenge files to {path}')
+            emit("progress", info + f'Downloading challenge files to {path}')
             try:
                 if exists(path) == False:
-                    self.chall.download(path)
-                    print(good + f"Download to {path} successful!")
+                    self.download(path)
+                    emit("downloaded", good + f"Download to {path} successful!")
                 elif isdir(path):
-                    self.chall.download(path.rstrip() + f'/{self.chall.name}.zip')
-                    print(good + f"Download to {path} successful!")
+                    self.download(path.rstrip() + f'/{self.chall.name}.zip')
+                    emit("downloaded", good + f"Download to {path} successful!")
                 elif isfile(path):
                     overwrite = input(important + "File specified already exists, do you want to overwrite it (y/n)? ")
                     if overwrite.lower() == 'y':
-                        self.chall.download(path)
-                        print(good + f"Download to {path} successful!")
+                        self.download(path)
+                        emit("downloaded", good + f"Download to {path} successful!")
                     else:
-                        print(info + "Skipping download...")
+                        emit("skipped", info + "Skipping download...")
                 else:
-                    print(important + "Path specified is not a directory or file, skipping...")
+                    emit("skipped", important + "Path specified is not a directory or file, skipping...")
             except Exception as e:
-                print(printError + f"We encountered an error: {e}")
+                emit("error", printError + f"We encountered an error: {e}")
         else:
-            print(important + f"{self.chall.name} doesn't have challenge files!")
+            emit("skipped", important + f"{self.chall.name} doesn't have challenge files!")
 
     def spawn_docker(self):
         if self.chall.has_docker:
-            print(info + f'Starting Docker instance...')
+            emit("progress", info + f'Starting Docker instance...')
             try:
                 instance = self.chall.start()
+                self.forget()
                 addr = f'{instance.ip}:{instance.port}'
-                print(good + f"Docker started @ {instance.ip}:{instance.port}")
+                self.tracker.add(self.chall.id, self.chall.name, addr)
+                emit("docker", good + f"Docker started @ {instance.ip}:{instance.port}", ip=instance.ip, port=instance.port, address=addr)
             except Exception as e:
-                print(printError + f"We encountered an error: {e}")
+                addr = ''
+                emit("error", printError + f"We encountered an error: {e}")
         else:
             addr = ''
-            print(important + f"{self.chall.name} doesn't have a deployed instance!")
+            emit("skipped", important + f"{self.chall.name} doesn't have a deployed instance!")
         return addr
 
+    def wait_for_docker(self, addr: str, timeout=readiness.DEFAULT_TIMEOUT, started=None):
+        """Wait until the docker instance accepts TCP connections"""
+        started = started or time.monotonic()
+        host, port = addr.rsplit(':', 1)
+        emit("progress", info + f"Waiting for {addr} to accept connections (timeout {timeout}s)...")
+        if readiness.wait_for_ports(host, [int(port)], timeout):
+            elapsed = time.monotonic() - started
+            emit("ready", good + f"Docker ready @ {addr} after {elapsed:.1f}s", address=addr, seconds=round(elapsed, 1))
+            return True
+        emit("error", printError + f"{addr} didn't come up within {timeout}s.", reason="timeout", address=addr)
+        return False
+
     def attempt_submission(self, flag: str, difficulty: int):
         try:
-            print(info + f'Submitting flag...')
+            emit("progress", info + f'Submitting flag...')
             submission = self.chall.submit(flag, difficulty)
             if submission:
-                print(good + f"Congratulations! {self.chall.name} ({self.chall.category}, {self.chall.points} pts) has been solved!")
+                self.forget()
+                emit("submission", good + f"Congratulations! {self.chall.name} ({self.chall.category}, {self.chall.points} pts) has been solved!",
+                     correct=True, points=self.chall.points)
         except errors.IncorrectFlagException:
-            print(printError + 'Incorrect flag!')
+            emit("submission", printError + 'Incorrect flag!', correct=False)
         except Exception as e:
-            print(printError + f"We encountered an error: {e}")
+            emit("error", printError + f"We encountered an error: {e}")
 
     def stop_instance(self):
         try:
-            print(info + f'Stopping {self.chall.name}...')
+            emit("progress", info + f'Stopping {self.chall.name}...')
             docker = challenge.DockerInstance('', '', self.chall.id, self.client)
             docker.stop()
+            self.forget()
+            self.tracker.remove(self.chall.id)
+            emit("stopped", name=self.chall.name)
         except Exception as e:
-            print(printError + f"We encountered an error: {e}")
\ No newline at end of file
+            emit("error", printError + f"We encountered an error: {e}")
\ No newline at end of file
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+from hackthebox import *
+from hackthebox.constants import USER_AGENT
+
+from htbcli.utils.credentials import CredentialStore, REFRESH_CHECK_INTERVAL, expires_soon, write_private
+from htbcli.utils.ratelimit import RateLimiter, MAX_RETRIES, backoff_delay, parse_retry_after
+
+
+class SessionClient(HTBClient):
+    """HTBClient that sends every request over one keep-alive requests.Session.
+
+    The upstream client calls requests.get/post directly, which opens a new
+    connection for each API call. Everything else (auth, caching, objects)
+    is inherited unchanged. Every request goes through send(), which paces
+    it with the shared RateLimiter and retries 429s. If a tracer
+    (htbcli.utils.profiler.Tracer) is attached, every call is recorded on it.
+
+    cache can also be a CredentialStore. Access tokens are refreshed a few
+    minutes before they expire rather than after a request fails, and the
+    new tokens are saved straight away. With interactive=False an expired
+    session raises AuthenticationException instead of prompting for a login.
+    """
+    # Where the tokens came from, saved back there whenever they're refreshed
+    _store = None
+
+    def __init__(self, *args, tracer=None, limiter=None, interactive=True, **kwargs) -> None:
+        self.tracer = tracer
+        self.interactive = interactive
+        self.limiter = limiter if limiter is not None else RateLimiter.from_env()
+        # endpoint -> validators and last body for poll()
+        self._polled = {}
+        # Refresh tokens are single use, so concurrent actions must not refresh at the same time
+        self._refresh_lock = threading.Lock()
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        super().__init__(*args, **kwargs)
+
+    def do_login(self, email=None, password=None, otp=None, remember=False, app_token=None):
+        if not self.interactive and app_token is None and (email is None or password is None):
+            raise errors.AuthenticationException("the saved session has expired and logging in again needs a terminal")
+        return super().do_login(email, password, otp, remember, app_token)
+
+    def _refresh_access_token(self):
+        start = self.tracer.now() if self.tracer else 0
+        r, retries = self.send("POST", "login/refresh", json={
+            "refresh_token": self._refresh_token
+        })
+        if self.tracer:
+            self.tracer.record("POST", "login/refresh", start, r.status_code, len(r.content), retries, retries)
+        data = r.json()['message']
+        if isinstance(data, str) and data.startswith("Unauthenticated"):
+            raise errors.AuthenticationException
+        self._access_token = data['access_token']
+        self._refresh_token = data['refresh_token']
+        if self._store is not None:
+            self.dump_to_cache(self._store)
+
+    def refresh_if_needed(self) -> bool:
+        """Refresh the access token if it expires soon. Returns whether it did"""
+        if self._app_token is not None or self._access_token is None or self._refresh_token is None:
+            return False
+        if not expires_soon(self._access_token):
+            return False
+        with self._refresh_lock:
+            # Another thread may have refreshed while we waited
+            if not expires_soon(self._access_token):
+                return False
+            self._refresh_access_token()
+            return True
+
+    def keep_fresh(self, interval=REFRESH_CHECK_INTERVAL) -> threading.Event:
+        """Refresh tokens in a background thread while idle (the agent). Set the returned event to stop it"""
+        stop = threading.Event()
+
+        def loop():
+            while not stop.wait(interval):
+                try:
+                    self.refresh_if_needed()
+                except Exception:
+                    # The next request will try again, and report it if it still fails
+                    pass
+        threading.Thread(target=loop, daemon=True).start()
+        return stop
+
+    def load_from_cache(self, cache) -> bool:
+        """Tokens from a CredentialStore or a cache file, refreshed now if they're about to expire"""
+        if isinstance(cache, CredentialStore):
+            data = cache.load()
+        else:
+            if not os.path.exists(cache):
+                return False
+            with open(cache, 'r') as f:
+                data = json.load(f)
+        if not data:
+            return False
+        self._access_token = data.get('access_token')
+        self._refresh_token = data.get('refresh_token')
+        self._app_token = data.get('app_token')
+        self._store = cache
+        try:
+            self.refresh_if_needed()
+        except errors.AuthenticationException:
+            # Our refresh token is also invalid, we must log in again
+            return False
+        return True
+
+    def dump_to_cache(self, cache):
+        """Save the current tokens, cache files are only readable by their owner"""
+        tokens = {"access_token": self._access_token, "refresh_token": self._refresh_token,
+                  "app_token": self._app_token}
+        if isinstance(cache, CredentialStore):
+            cache.save(tokens)
+        else:
+            write_private(cache, json.dumps(tokens).encode())
+        self._store = cache
+
+    def auth_headers(self) -> dict:
+        """Authorization header for the current tokens, refreshing the access token before it expires"""
+        if self._app_token is not None:
+            return {"Authorization": "Bearer " + self._app_token}
+        if self._access_token is not None and self._refresh_token is not None:
+            self.refresh_if_needed()
+            return {"Authorization": "Bearer " + self._access_token}
+        raise errors.AuthenticationException("No authentication tokens available")
+
+    def send(self, method: str, endpoint: str, **kwargs):
+        """Send one request, waiting for the rate limiter first and retrying 429s.
+
+        Honours Retry-After, otherwise backs off with jitter. Gives up with
+        RateLimitException after MAX_RETRIES. Returns (response, retries).
+        """
+        for attempt in range(MAX_RETRIES + 1):
+            if self.limiter is not None:
+                self.limiter.acquire()
+            r = self.session.request(method, self._api_base + endpoint, **kwargs)
+            if r.status_code != 429:
+                return r, attempt
+            retry_after = parse_retry_after(r.headers.get("Retry-After"))
+            r.close()
+            if attempt == MAX_RETRIES:
+                break
+            delay = backoff_delay(attempt, retry_after)
+            if self.limiter is not None:
+                # Everyone sharing the bucket waits, not just this request
+                self.limiter.penalize(delay)
+            else:
+                time.sleep(delay)
+        raise errors.RateLimitException(f"still rate limited after {MAX_RETRIES} retries of {endpoint}")
+
+    def poll(self, endpoint: str):
+        """GET endpoint conditionally, for things checked over and over. Returns (data, changed).
+
+        Sends If-None-Match/If-Modified-Since from the previous poll so an
+        unchanged resource costs a bodyless 304. Servers that ignore them still
+        get the body compared, so changed is only True when something changed.
+        """
+        previous = self._polled.get(endpoint)
+        headers = self.auth_headers()
+        if previous is not None:
+            if previous["etag"]:
+                headers["If-None-Match"] = previous["etag"]
+            if previous["last_modified"]:
+                headers["If-Modified-Since"] = previous["last_modified"]
+        start = self.tracer.now() if self.tracer else 0
+        r, retries = self.send("GET", endpoint, headers=headers)
+        if self.tracer:
+            self.tracer.record("GET", endpoint, start, r.status_code, len(r.content), retries, retries)
+        if r.status_code == 304 and previous is not None:
+            return previous["data"], False
+        if r.status_code == 404:
+            raise errors.NotFoundException
+        digest = hashlib.sha256(r.content).hexdigest()
+        if previous is not None and previous["digest"] == digest:
+            previous.update(etag=r.headers.get("ETag"), last_modified=r.headers.get("Last-Modified"))
+            return previous["data"], False
+        data = r.json()
+        self._polled[endpoint] = {"etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified"),
+                                  "digest": digest, "data": data}
+        return data, True
+
+    def do_request(self, endpoint, json_data=None, data=None, authorized=True, download=False, post=False):
+        headers = self.auth_headers() if authorized else {}
+        if not json_data and not data:
+            method = "POST" if post else "GET"
+        else:
+            method = "POST"
+        start = self.tracer.now() if self.tracer else 0
+        try:
+            r, retries = self.send(method, endpoint, json=json_data or None, data=data, headers=headers, stream=download)
+        except (requests.RequestException, errors.RateLimitException) as e:
+            if self.tracer:
+                limited = MAX_RETRIES if isinstance(e, errors.RateLimitException) else 0
+                self.tracer.record(method, endpoint, start, retries=limited, rate_limited=limited, error=str(e))
+            raise
+        if self.tracer:
+            self.tracer.record(method, endpoint, start, r.status_code, len(r.content), retries, retries)
+        if r.status_code == 404:
+            raise errors.NotFoundException
+        if download:
+            return r.content
+        else:
+            return r.json()
@@ -1,80 +1,244 @@
 #!/usr/bin/env python3
+import time
+
 from hackthebox import *
+from htbcli.utils.cache import MetadataCache
 from htbcli.utils.colors import *
+from htbcli.utils import readiness
+from htbcli.utils.output import emit
+
+# What each action needs fetched before it can run. Stop and reset only act on
+# whatever is assigned, so they never need the machine profile.
+PLAN = {
+    "info": ("machine",),
+    "spawn": ("machine",),
+    "flag": ("machine",),
+    "stop": ("active",),
+    "reset": ("active",),
+}
+
 
 class MachineInterface:
-    def __init__(self, client: HTBClient, name) -> None:
+    """Machine actions that fetch only what they need, once per invocation.
+
+    The machine profile and the active machine info are loaded lazily and
+    shared between actions, so e.g. spawn followed by stop doesn't ask the
+    API what's running.
+    """
+    def __init__(self, client: HTBClient, name, cache: MetadataCache = None) -> None:
         self.client = client
         self.name = name
-        print(info + f'Accessing machine {self.name}...')
-        try:
-            self.machine = self.client.get_machine(self.name)
-            name = self.machine.name
-        except errors.NotFoundException:
-            print(printError + "Could not find machine. Exiting...")
-            exit()
-        print(good + f"Machine {self.machine.name} ({self.machine.os}, {self.machine.difficulty}) retrieved!")
+        self.cache = cache
+        self._machine = None
+        self._active = None
+        self._active_known = False
+
+    def prepare(self, actions):
+        """Fetch up front what the planned actions need that can be fetched up front (the profile)"""
+        needs = {need for action in actions for need in PLAN[action]}
+        if "machine" in needs:
+            self.machine
+        return needs
+
+    @property
+    def machine(self):
+        if self._machine is None:
+            emit("lookup", info + f'Accessing machine {self.name}...')
+            try:
+                if self.cache is not None:
+                    self._machine = self.cache.get_machine(self.client, self.name)
+                else:
+                    self._machine = self.client.get_machine(self.name)
+            except errors.NotFoundException:
+                emit("error", printError + "Could not find machine. Exiting...", reason="not_found")
+                exit()
+            emit("machine", good + f"Machine {self._machine.name} ({self._machine.os}, {self._machine.difficulty}) retrieved!",
+                 id=self._machine.id, name=self._machine.name, os=self._machine.os, difficulty=self._machine.difficulty,
+                 points=self._machine.points)
+        return self._machine
+
+    def forget(self):
+        """Drop the cached copy of this machine after changing its state"""
+        if self.cache is not None and self._machine is not None:
+            self.cache.invalidate("machine", self._machine.id)
+
+    def active(self, release_arena=False):
+        """Info for the assigned machine (or None), asked for at most once unless something changed it"""
+        if not self._active_known:
+            self._active = self.active_info(release_arena)
+            self._active_known = True
+        return self._active
+
+    def set_active(self, active):
+        """Record what we know is assigned now, after spawning or stopping"""
+        self._active = active
+        self._active_known = True
+
+    def is_release_arena(self, active: dict) -> bool:
+        """Whether the assigned machine is in the release arena, from its type if the API sent one"""
+        if active.get('release_arena') is not None:
+            return active['release_arena']
+        if active.get('type'):
+            return 'release' in active['type'].lower()
+        # No type, ask the connections endpoint (upstream Machine.is_release trips over a null machine there)
+        data = self.client.do_request("connections")['data']
+        machine = (data.get('release_arena') or {}).get('machine') or {}
+        return machine.get('id') == active.get('id')
+
+    @staticmethod
+    def spawned(data: dict) -> bool:
+        """Whether a vm/spawn or machine/play reply says the machine is ours now"""
+        message = str(data.get("message"))
+        return "Machine deployed" in message or "You have been assigned" in message
 
     def spawn_machine(self, release_arena: bool):
+        machine = self.machine
         try:
             if release_arena:
-                print(info + f'Spawning {self.name} in Release Arena...')
-                instance = self.machine.spawn(release_arena=True)
+                emit("progress", info + f'Spawning {self.name} in Release Arena...')
+                data = self.client.do_request("release_arena/spawn", post=True)
+                if data.get("success") != 1:
+                    raise Exception(f"Failed to spawn: {data}")
+                ip = self.client.do_request("release_arena/active")['info']['ip']
             else:
-                print(info + f'Spawning {self.name}...')
-                try:
-                    instance = self.machine.spawn()
-                except Exception as e:
-                    request = self.client.do_request(f'machine/play/{self.machine.id}', post=True)
-                    instance = self.client.get_active_machine()
-            ip = instance.ip
-            print(good + f"{self.machine.name} started @ {instance.ip}")
-            print(f"  \\\\--> Server: {instance.server}")
+                emit("progress", info + f'Spawning {self.name}...')
+                data = self.client.do_request("vm/spawn", json_data={"machine_id": machine.id})
+                if not self.spawned(data):
+                    # Older accounts still spawn through the play endpoint
+                    data = self.client.do_request(f'machine/play/{machine.id}', post=True)
+                    if not self.spawned(data):
+                        raise Exception(f"Failed to spawn: {data.get('message') or data}")
+                # The profile only carries the IP once the machine is assigned, so this one can't come from the cache
+                ip = self.client.do_request(f"machine/profile/{machine.id}")['info']['ip']
+            if not ip:
+                self.forget()
+                emit("error", printError + f"{machine.name} was spawned but no IP came back, check 'htbcli status'.",
+                     reason="no_ip")
+                return ''
+            server = self.client.get_current_vpn_server(release_arena)
+            self.forget()
+            self.set_active({"id": machine.id, "name": machine.name, "ip": ip, "release_arena": release_arena})
+            emit("spawn", good + f"{machine.name} started @ {ip}", machine=machine.name,
+                 ip=ip, server=str(server), release_arena=release_arena)
+            emit("progress", f"  \\\\--> Server: {server}")
         except Exception as e:
             ip = ''
-            print(printError + f"We encountered an error: {e}")
+            emit("error", printError + f"We encountered an error: {e}")
         return ip
 
     def attempt_submission(self, flag: str, difficulty: int):
         try:
-            print(info + f'Submitting flag...')
+            emit("progress", info + f'Submitting flag...')
             submission = self.machine.submit(flag, difficulty)
-            print(good + submission)
+            self.forget()
+            emit("submission", good + submission, correct=True)
         except errors.IncorrectFlagException:
-            print(printError + 'Incorrect flag!')
+            emit("submission", printError + 'Incorrect flag!', correct=False)
         except errors.UserAlreadySubmitted:
-            print(important + "You've already submitted the user flag!")
+            emit("submission", important + "You've already submitted the user flag!", correct=None)
         except errors.RootAlreadySubmitted:
-            print(important + "You've already submitted the root flag!")
+            emit("submission", important + "You've already submitted the root flag!", correct=None)
         except Exception as e:
-            print(printError + f"We encountered an error: {e}")
+            emit("error", printError + f"We encountered an error: {e}")
 
-    def stop_instance(self):
-        instance = self.client.get_active_machine()
-        if instance is None:
-            print(printError + "No assigned machine detected! Exiting...")
-            exit()
-        if instance is not None:
-            try:
-                print(info + f"Stopping {instance.machine.name} ({instance.ip})...")
-                instance.stop()
-                if self.client.get_active_machine() is not None:
-                    request = self.client.do_request(f'machine/stop', post=True)
-            except Exception as e:
-                print(printError + f"We encountered an error: {e}")
-
-    def reset_instance(self):
-        instance = self.client.get_active_machine()
-        if instance is None:
-            print(printError + "No assigned machine detected! Exiting...")
+    def _require_active(self, release_arena=False) -> dict:
+        active = self.active(release_arena)
+        if active is None:
+            emit("error", printError + "No assigned machine detected! Exiting...", reason="no_active_machine")
             exit()
+        return active
+
+    def stop_instance(self, release_arena=False):
+        active = self._require_active(release_arena)
+        label = f"{active['name']} ({active['ip']})" if active.get('ip') else active['name']
         try:
-            print(info + f"Attempting to reset {instance.machine.name} ({instance.ip})")
-            attempt = instance.reset()
-            if attempt:
-                print(good + "Reset message sent! You might want to wait 1 to 5 minutes before hacking again, or just check the actual website for the current status.")
+            emit("progress", info + f"Stopping {label}...")
+            if release_arena or self.is_release_arena(active):
+                data = self.client.do_request("release_arena/terminate", post=True)
+            else:
+                data = self.client.do_request("vm/terminate", json_data={"machine_id": active['id']})
+                if data.get("success") is False:
+                    # Older accounts still stop through the play-era endpoint
+                    data = self.client.do_request('machine/stop', post=True)
+            self.set_active(None)
+            self.forget()
+            emit("stopped", machine=active['name'], ip=active.get('ip'))
+        except Exception as e:
+            emit("error", printError + f"We encountered an error: {e}")
+
+    def reset_instance(self, release_arena=False):
+        active = self._require_active(release_arena)
+        label = f"{active['name']} ({active['ip']})" if active.get('ip') else active['name']
+        try:
+            emit("progress", info + f"Attempting to reset {label}")
+            if release_arena or self.is_release_arena(active):
+                resp = self.client.do_request("release_arena/reset", json_data={"machine_id": active['id']})
+            else:
+                resp = self.client.do_request("vm/reset", json_data={"machine_id": active['id']})
+            message = str(resp.get("message"))
+            if message.endswith(" will be reset in 1 minute.") or resp.get("success"):
+                emit("reset", good + "Reset message sent! You might want to wait 1 to 5 minutes before hacking again, or just check the actual website for the current status.",
+                     machine=active['name'], ip=active.get('ip'))
+                return active.get('ip')
+            if message == "Too many reset machine attempts. Try again later!" or message.startswith("You must wait"):
+                raise TooManyResetAttempts
+            raise MachineException(message)
         except TooManyResetAttempts:
-            print(printError + "Too many reset machine attempts. Try again later!")
+            emit("error", printError + "Too many reset machine attempts. Try again later!", reason="too_many_resets")
         except Exception as e:
-            print(printError + f"We encountered an error: {e}")
-        
\ No newline at end of file
+            emit("error", printError + f"We encountered an error: {e}")
+
+    def active_info(self, release_arena=False):
+        """Raw info for the assigned machine, or None"""
+        endpoint = "release_arena/active" if release_arena else "machine/active"
+        return self.client.do_request(endpoint)['info'] or None
+
+    def wait_until_ready(self, release_arena=False, ports=None, timeout=readiness.DEFAULT_TIMEOUT, started=None):
+        """Poll the active machine endpoint (and optionally TCP ports) until the box is usable"""
+        started = started or time.monotonic()
+        emit("progress", info + f"Waiting for {self.machine.name} to come up (timeout {timeout}s)...")
+
+        def spawned():
+            active = self.active_info(release_arena)
+            if active and active.get('id') == self.machine.id and active.get('ip') and not active.get('isSpawning'):
+                return active
+            return None
+        try:
+            active = readiness.poll(spawned, timeout)
+            if active is not None:
+                self.set_active(active)
+        except Exception as e:
+            emit("error", printError + f"We encountered an error: {e}")
+            return False
+        if active is None:
+            emit("error", printError + f"{self.machine.name} wasn't assigned within {timeout}s.", reason="timeout")
+            return False
+
+        if ports:
+            remaining = max(1, timeout - (time.monotonic() - started))
+            emit("progress", info + f"Machine assigned, checking {active['ip']} on port(s) {', '.join(map(str, ports))}...")
+            if not readiness.wait_for_ports(active['ip'], ports, remaining):
+                emit("error", printError + f"{active['ip']} didn't open port(s) {', '.join(map(str, ports))} within {timeout}s.",
+                     reason="timeout", ip=active['ip'], ports=ports)
+                return False
+        elapsed = time.monotonic() - started
+        emit("ready", good + f"{self.machine.name} ready @ {active['ip']} after {elapsed:.1f}s", ip=active['ip'],
+             seconds=round(elapsed, 1))
+        return True
+
+    def wait_after_reset(self, ip: str, ports=None, timeout=readiness.DEFAULT_TIMEOUT):
+        """Resets don't show up in the API, so watch the box's ports go down and come back"""
+        if not ports:
+            emit("skipped", important + "Waiting for a reset needs --wait-ports, skipping the wait.")
+            return False
+        started = time.monotonic()
+        emit("progress", info + f"Waiting for {ip} to go down and come back on port(s) {', '.join(map(str, ports))}...")
+        # The reset is scheduled about a minute out, if we never see it go down just check it's up
+        readiness.wait_for_ports(ip, ports, min(timeout, 120), closed=True)
+        remaining = max(1, timeout - (time.monotonic() - started))
+        if not readiness.wait_for_ports(ip, ports, remaining):
+            emit("error", printError + f"{ip} didn't come back within {timeout}s.", reason="timeout", ip=ip)
+            return False
+        elapsed = time.monotonic() - started
+        emit("ready", good + f"Reset finished, {ip} ready after {elapsed:.1f}s", ip=ip, seconds=round(elapsed, 1))
+        return True
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+import sys
+import time
+from datetime import datetime
+
+from hackthebox import *
+from htbcli.utils.colors import *
+from htbcli.utils.instances import DockerTracker
+from htbcli.utils.output import emit, get_emitter
+from htbcli.utils import readiness
+
+DEFAULT_INTERVAL = 10
+DEFAULT_MAX_INTERVAL = 120
+# How much longer to wait after every poll where nothing changed
+BACKOFF_FACTOR = 1.5
+
+
+class StatusInterface:
+    """One view of the active machine, tracked challenge dockers and the assigned VPN server"""
+    def __init__(self, client: HTBClient, release_arena=False, tracker: DockerTracker = None) -> None:
+        self.client = client
+        self.release_arena = release_arena
+        self.tracker = tracker if tracker is not None else DockerTracker()
+        self.polls = 0
+        self.unchanged = 0
+
+    def _poll(self, endpoint: str):
+        """Conditional GET when the client supports it, a plain one otherwise"""
+        self.polls += 1
+        if hasattr(self.client, "poll"):
+            data, changed = self.client.poll(endpoint)
+        else:
+            data, changed = self.client.do_request(endpoint), True
+        self.unchanged += not changed
+        return data
+
+    def machine(self):
+        endpoint = "release_arena/active" if self.release_arena else "machine/active"
+        active = self._poll(endpoint).get('info')
+        if not active:
+            return None
+        return {"id": active.get('id'), "name": active.get('name'), "ip": active.get('ip'),
+                "type": active.get('type'), "spawning": bool(active.get('isSpawning'))}
+
+    def vpn(self):
+        data = self._poll("connections").get('data') or {}
+        server = (data.get('lab') or {}).get('assigned_server')
+        if not server:
+            return None
+        return {"id": server.get('id'), "server": server.get('friendly_name'),
+                "users": server.get('current_clients'), "location": server.get('location')}
+
+    def dockers(self) -> list:
+        """Tracked dockers with a quick TCP check each, no API calls"""
+        dockers = []
+        for chall_id, docker in sorted(self.tracker.all().items(), key=lambda d: d[1]["started"]):
+            host, port = docker["address"].rsplit(':', 1)
+            up = readiness.ports_open(host, [int(port)], timeout=1.0)[int(port)]
+            dockers.append({"id": int(chall_id), "name": docker["name"], "address": docker["address"],
+                            "started": docker["started"], "up": up})
+        return dockers
+
+    def snapshot(self) -> dict:
+        return {"machine": self.machine(), "vpn": self.vpn(), "dockers": self.dockers()}
+
+    def render(self, snap: dict):
+        machine = snap["machine"]
+        if machine is None:
+            print(info + "Machine: none assigned")
+        else:
+            state = "spawning" if machine["spawning"] else (machine["ip"] or "no IP yet")
+            print(good + f"Machine: {machine['name']} @ {state}" + (f" ({machine['type']})" if machine["type"] else ""))
+        vpn = snap["vpn"]
+        if vpn is None:
+            print(info + "VPN: no lab server assigned")
+        else:
+            print(good + f"VPN: {vpn['server']} ({vpn['users']} users)")
+        if not snap["dockers"]:
+            print(info + "Dockers: none started from here")
+        for docker in snap["dockers"]:
+            age = (time.time() - docker["started"]) / 60
+            print((good if docker["up"] else important)
+                  + f"Docker: {docker['name']} @ {docker['address']} ({'up' if docker['up'] else 'not answering'}, started {age:.0f} min ago)")
+
+    def show(self, snap: dict, changed: bool, next_in=None):
+        """Report a snapshot: an event when it changed, and the text view"""
+        if changed:
+            emit("status", **snap)
+        if get_emitter().mode != "text":
+            return
+        live = next_in is not None and sys.stdout.isatty()
+        if live:
+            # Redraw in place
+            sys.stdout.write("\033[H\033[J")
+        elif not changed:
+            return
+        stamp = datetime.now().strftime('%H:%M:%S')
+        print('─'*50)
+        self.render(snap)
+        footer = f"{stamp}"
+        if next_in is not None:
+            footer += f", next check in {next_in:.0f}s ({self.polls} polls, {self.unchanged} unchanged)"
+        print('─'*50 + "\n" + footer)
+        sys.stdout.flush()
+
+    def watch(self, interval=DEFAULT_INTERVAL, max_interval=DEFAULT_MAX_INTERVAL):
+        """Keep polling until Ctrl+C, slowing down while nothing changes and speeding back up when it does"""
+        previous = None
+        delay = interval
+        try:
+            while True:
+                snap = self.snapshot()
+                changed = snap != previous
+                spawning = snap["machine"] is not None and snap["machine"]["spawning"]
+                if changed or spawning:
+                    delay = interval
+                else:
+                    delay = min(max_interval, delay * BACKOFF_FACTOR)
+                self.show(snap, changed, delay)
+                previous = snap
+                time.sleep(delay)
+        except KeyboardInterrupt:
+            print()
@@ -1,75 +1,136 @@
 #!/usr/bin/env python3
 from hackthebox import *
 from htbcli.utils.colors import *
-from os.path import expanduser, isdir, isfile, exists
+from htbcli.utils.download import download_vpn_config
+from htbcli.utils import probe
+from htbcli.utils.output import emit
+from htbcli.utils.credentials import write_private
+from htbcli.utils.vpncache import VpnConfigCache
+from os.path import expanduser, isdir, isfile, exists, basename
 
 class VpnInterface:
-    def __init__(self, client: HTBClient, name, release_arena=False) -> None:
+    def __init__(self, client: HTBClient, name, release_arena=False, configs: VpnConfigCache = None) -> None:
         self.client = client
         self.name = name
-        self.vpn_servers = [v for v in self.client.get_all_vpn_servers(release_arena)]
-        self.vpn_names = [v.friendly_name.lower() for v in self.vpn_servers]
+        self.release_arena = release_arena
+        self.configs = configs
+        self._servers = None
+
+    @property
+    def vpn_servers(self) -> list:
+        """Every server we could switch to, only listed the first time switching needs it"""
+        if self._servers is None:
+            self._servers = [v for v in self.client.get_all_vpn_servers(self.release_arena)]
+        return self._servers
+
+    @property
+    def vpn_names(self) -> list:
+        return [v.friendly_name.lower() for v in self.vpn_servers]
+
+    def save_config(self, server, path: str, tcp=False):
+        """Write server's config to path, from the local config cache when it's still current. Returns (path, size, sha256, cached)"""
+        if self.configs is None or not self.configs.enabled:
+            return download_vpn_config(self.client, server, path, tcp) + (False,)
+        source, cached = self.configs.fetch(self.client, server, tcp, self.release_arena)
+        with open(source, 'rb') as f:
+            data = f.read()
+        # The config carries the account's private key
+        write_private(path, data)
+        return path, len(data), basename(source)[:-len(".ovpn")], cached
+
+    def auto_switch(self, target=probe.DEFAULT_TARGET, ttl=probe.DEFAULT_TTL, workers=16, rtt_fn=probe.tcp_rtt):
+        """Probe every server and switch to the one with the best RTT + load score, unless we're already on it"""
+        emit("progress", info + f"Probing {len(self.vpn_servers)} servers...")
+        try:
+            ranked = probe.rank_servers(self.vpn_servers, target, workers, probe.ProbeCache(ttl=ttl), rtt_fn)
+        except Exception as e:
+            emit("error", printError + f"We encountered an error: {e}")
+            return
+        if not ranked:
+            emit("error", printError + "None of the servers answered, not switching.", reason="unreachable")
+            return
+        for score, rtt, server in ranked[:5]:
+            emit("candidate", f"  {recc}{server.friendly_name} (rtt: {rtt:.0f} ms, users: {server.current_clients}, score: {score:.0f})",
+                 server=server.friendly_name, id=server.id, rtt_ms=round(rtt, 1), users=server.current_clients,
+                 score=round(score, 1))
+        desired = ranked[0][2]
+        try:
+            current = self.client.get_current_vpn_server(self.release_arena)
+            if current is not None and current.id == desired.id:
+                emit("switched", good + f"Already on the best server, {desired.friendly_name}.", server=desired.friendly_name,
+                     id=desired.id, unchanged=True)
+                return
+            emit("progress", info + f"Attempting to switch to {desired}...")
+            desired.switch()
+            emit("switched", good + "Switched!", server=desired.friendly_name, id=desired.id)
+        except Exception as e:
+            emit("error", printError + f"We encountered an error: {e}")
 
     def switch_servers(self, new_server:str):
         try:
             if new_server is not None and new_server.lower() != "menu":
-                print(info + f"Finding {new_server}...")
+                emit("progress", info + f"Finding {new_server}...")
                 if new_server.lower() in self.vpn_names:
                     desired = self.vpn_servers[self.vpn_names.index(new_server.lower())]
-                    print(info + f"Attempting to switch to {desired}...")
+                    emit("progress", info + f"Attempting to switch to {desired}...")
                     desired.switch()
-                    print(good + "Switched!")
+                    emit("switched", good + "Switched!", server=desired.friendly_name, id=desired.id)
                 else:
-                    print(important + "Couldn't find server.")
+                    emit("warning", important + "Couldn't find server.", server=new_server)
                     new_server = 'menu'
         except Exception as e:
-            print(printError + f"We encountered an error: {e}")
+            emit("error", printError + f"We encountered an error: {e}")
 
         try:
             if new_server.lower() == 'menu':
-                print(info + "Bringing up options...")
+                emit("progress", info + "Bringing up options...")
                 for i,v in enumerate(self.vpn_servers):
-                    print(f"  {recc}{i} -> {v.friendly_name} (users: {v.current_clients})")
+                    emit("candidate", f"  {recc}{i} -> {v.friendly_name} (users: {v.current_clients})",
+                         index=i, server=v.friendly_name, id=v.id, users=v.current_clients)
                 
                 selection = -1
                 while selection < 0 or selection >= len(self.vpn_names):
                     selection = int(input(recc + 'Type the index of the server you want to switch to: '))
 
-                print(info + f"Selected {self.vpn_names[selection]}")
+                emit("progress", info + f"Selected {self.vpn_names[selection]}")
                 desired = self.vpn_servers[selection]
-                print(info + f"Attempting to switch to {desired}...")
+                emit("progress", info + f"Attempting to switch to {desired}...")
                 desired.switch()
-                print(good + "Switched!")
+                emit("switched", good + "Switched!", server=desired.friendly_name, id=desired.id)
         except Exception as e:
-            print(printError + f"We encountered an error: {e}")
+            emit("error", printError + f"We encountered an error: {e}")
 
     def download_vpn(self, path: str, tcp=False):
         try:
-            print(info + f'Accessing current VPN Server...')
-            server = self.client.get_current_vpn_server()
-            print(good + f'Server {server.friendly_name} found!')
+            emit("lookup", info + f'Accessing current VPN Server...')
+            server = self.client.get_current_vpn_server(self.release_arena)
+            emit("server", good + f'Server {server.friendly_name} found!', server=server.friendly_name, id=server.id,
+                 users=server.current_clients)
         except Exception as e:
-            print(printError + f"We encountered an error: {e}")
-            print(info + "Exiting...")
+            emit("error", printError + f"We encountered an error: {e}")
+            emit("progress", info + "Exiting...")
             exit()
 
         path = expanduser(path)
-        print(info + f'Downloading VPN file to {path}')
+        emit("progress", info + f'Downloading VPN file to {path}')
         try:
             if exists(path) == False:
-                server.download(path, tcp)
-                print(good + "Download successful!")
+                _, size, sha256, cached = self.save_config(server, path, tcp)
+                emit("download", good + ("Up to date config copied from cache!" if cached else "Download successful!"),
+                     path=path, bytes=size, sha256=sha256, cached=cached)
             elif isdir(path):
-                server.download(path.rstrip() + f'/{server.name}.ovpn', tcp)
-                print(good + "Download successful!")
+                path, size, sha256, cached = self.save_config(server, path.rstrip() + f'/{server.friendly_name}.ovpn', tcp)
+                emit("download", good + ("Up to date config copied from cache!" if cached else "Download successful!"),
+                     path=path, bytes=size, sha256=sha256, cached=cached)
             elif isfile(path):
                 overwrite = input(important + "File specified already exists, do you want to overwrite it (y/n)? ")
                 if overwrite.lower() == 'y':
-                    server.download(path)
-                    print(good + f"Download to {path} successful!")
+                    _, size, sha256, cached = self.save_config(server, path, tcp)
+                    emit("download", good + f"Download to {path} successful!", path=path, bytes=size, sha256=sha256,
+                         cached=cached)
                 else:
-                    print(info + "Skipping download...")
+                    emit("skipped", info + "Skipping download...")
             else:
-                print(important + "Path specified is not a directory or file, skipping...")
+                emit("skipped", important + "Path specified is not a directory or file, skipping...")
         except Exception as e:
-            print(printError + f"We encountered an error: {e}")
\ No newline at end of file
+            emit("error", printError + f"We encountered an error: {e}")
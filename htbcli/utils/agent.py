@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+from contextlib import redirect_stdout, redirect_stderr
+from os.path import expanduser, join, dirname, exists
+
+from htbcli.utils.cache import DEFAULT_CACHE_DIR
+
+DEFAULT_SOCKET = os.environ.get("HTBCLI_AGENT_SOCKET", join(DEFAULT_CACHE_DIR, "agent.sock"))
+
+
+def agent_supported() -> bool:
+    return hasattr(socket, "AF_UNIX")
+
+
+class StreamWriter(io.TextIOBase):
+    """File-like object that forwards writes to the agent client as JSON lines"""
+    def __init__(self, wfile, stream: str) -> None:
+        self.wfile = wfile
+        self.stream = stream
+
+    def write(self, data):
+        if data:
+            self.wfile.write((json.dumps({self.stream: data}) + "\n").encode())
+            self.wfile.flush()
+        return len(data)
+
+    def isatty(self):
+        return False
+
+
+class AgentHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+        except ValueError:
+            return
+        if request.get("shutdown"):
+            self.reply({"exit": 0})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+        # Commands run on the agent's login, so only take ones meant for the same account
+        identity = request.get("identity")
+        if identity is None or identity != self.server.identity:
+            self.reply({"refused": "logged in as a different account"})
+            return
+
+        code = 0
+        stdin = sys.stdin
+        cwd = os.getcwd()
+        # Commands can't prompt through the socket, so input() sees EOF instead of blocking the agent
+        sys.stdin = io.StringIO()
+        try:
+            with redirect_stdout(StreamWriter(self.wfile, "stdout")), redirect_stderr(StreamWriter(self.wfile, "stderr")):
+                try:
+                    os.chdir(request.get("cwd", cwd))
+                    self.server.run_command(request["argv"])
+                except SystemExit as e:
+                    code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+                except Exception as e:
+                    print(f"agent: {type(e).__name__}: {e}", file=sys.stderr)
+                    code = 1
+        except BrokenPipeError:
+            return
+        finally:
+            sys.stdin = stdin
+            os.chdir(cwd)
+        self.reply({"exit": code})
+
+    def reply(self, message: dict):
+        self.wfile.write((json.dumps(message) + "\n").encode())
+        self.wfile.flush()
+
+
+class AgentServer(socketserver.UnixStreamServer):
+    """Serves CLI invocations over a Unix socket using one long-lived, authenticated client.
+
+    Requests are handled one at a time, in the order they arrive. Requests
+    for any login other than identity (see HTBCLI.credential_identity) are
+    refused, and the caller runs them itself.
+    """
+    def __init__(self, socket_path: str, run_command, identity=None) -> None:
+        self.socket_path = expanduser(socket_path)
+        self.run_command = run_command
+        self.identity = identity
+        os.makedirs(dirname(self.socket_path), mode=0o700, exist_ok=True)
+        if exists(self.socket_path):
+            if ping(self.socket_path):
+                raise OSError(f"an agent is already listening on {self.socket_path}")
+            os.unlink(self.socket_path)
+        umask = os.umask(0o177)
+        try:
+            super().__init__(self.socket_path, AgentHandler)
+        finally:
+            os.umask(umask)
+
+    def server_close(self):
+        super().server_close()
+        if exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def _connect(socket_path: str):
+    if not agent_supported():
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(expanduser(socket_path))
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def ping(socket_path: str) -> bool:
+    sock = _connect(socket_path)
+    if sock is None:
+        return False
+    sock.close()
+    return True
+
+
+def forward(argv: list, socket_path=DEFAULT_SOCKET, stdout=None, identity=None):
+    """Run argv on a running agent, relaying its output.
+
+    Returns the exit code, or None if no agent is listening or it is logged
+    in as someone other than identity.
+    """
+    stdout = stdout or sys.stdout
+    sock = _connect(socket_path)
+    if sock is None:
+        return None
+    with sock, sock.makefile('rwb') as f:
+        f.write((json.dumps({"argv": argv, "cwd": os.getcwd(), "identity": identity}) + "\n").encode())
+        f.flush()
+        for line in f:
+            message = json.loads(line)
+            if "refused" in message:
+                return None
+            if "stdout" in message:
+                stdout.write(message["stdout"])
+                stdout.flush()
+            elif "stderr" in message:
+                sys.stderr.write(message["stderr"])
+                sys.stderr.flush()
+            elif "exit" in message:
+                return message["exit"]
+    # The agent went away mid-command
+    return 1
+
+
+def shutdown(socket_path=DEFAULT_SOCKET) -> bool:
+    sock = _connect(socket_path)
+    if sock is None:
+        return False
+    with sock, sock.makefile('rwb') as f:
+        f.write(b'{"shutdown": true}\n')
+        f.flush()
+        f.readline()
+    return True
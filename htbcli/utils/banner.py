@@ -19,7 +19,8 @@ class BannerBuilder:
             "release_arena": "\N{chequered flag} Release Arena?",
             "switch": "\N{globe with meridians} New Server",
             "tcp":"📶 Use TCP?",
-            "download":"💼 Download Path"
+            "download":"💼 Download Path",
+            "bulk":"📦 Bulk Source"
         }
 
     def build_banner(self):
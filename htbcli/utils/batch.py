@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+import json
+import sys
+
+BATCH_SUBCOMMANDS = ('challenge', 'machine', 'vpn')
+
+
+def load_manifest(path: str) -> list:
+    """Read batch operations from a JSONL or YAML file, or JSONL from stdin when path is '-'"""
+    if path == '-':
+        text = sys.stdin.read()
+    else:
+        with open(path, 'r') as f:
+            text = f.read()
+
+    if path.endswith(('.yml', '.yaml')):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("YAML manifests need PyYAML installed (pip install pyyaml), or use JSONL instead")
+        ops = yaml.safe_load(text) or []
+        if not isinstance(ops, list):
+            raise ValueError("YAML manifest must be a list of operations")
+        return ops
+
+    ops = []
+    for lineno, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            ops.append(json.loads(line))
+        except ValueError as e:
+            raise ValueError(f"line {lineno}: {e}")
+    return ops
+
+
+def op_to_argv(op) -> list:
+    """Turn a manifest operation into subcommand argv.
+
+    An operation is either a list of arguments, e.g. ["machine", "-n", "Lame", "-s"],
+    or a mapping of long option names, e.g. {"subcommand": "machine", "name": "Lame", "spawn": true}.
+    """
+    if isinstance(op, list):
+        argv = [str(a) for a in op]
+    elif isinstance(op, dict):
+        op = dict(op)
+        argv = [str(op.pop('subcommand', ''))]
+        for key, value in op.items():
+            flag = '--' + key.replace('_', '-')
+            if value is True:
+                argv.append(flag)
+            elif value is False or value is None:
+                continue
+            else:
+                argv += [flag, str(value)]
+    else:
+        raise ValueError(f"operation must be a list or mapping, got {type(op).__name__}")
+
+    if not argv or argv[0] not in BATCH_SUBCOMMANDS:
+        raise ValueError(f"operation must start with one of {', '.join(BATCH_SUBCOMMANDS)}")
+    return argv
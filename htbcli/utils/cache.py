@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+import hashlib
+import json
+import os
+import threading
+import time
+from os.path import expanduser, join, dirname
+
+DEFAULT_CACHE_DIR = join(expanduser("~"), ".cache", "htbcli")
+
+# How long (in seconds) a cached entry is trusted before we ask the API again.
+# Machine profiles carry things like the assigned IP, so they go stale faster.
+DEFAULT_TTL = {
+    "challenge": 24 * 60 * 60,
+    "machine": 60 * 60,
+}
+DEFAULT_MAX_ENTRIES = 256
+
+
+def account_dir(identity: str) -> str:
+    """Cache directory for things that differ per account (solves, IPs, dockers, VPN configs)"""
+    return join(DEFAULT_CACHE_DIR, "accounts", hashlib.sha256(identity.encode()).hexdigest()[:16])
+
+
+class MetadataCache:
+    """On-disk cache of raw challenge/machine API data, keyed by ID and lowercased name."""
+    def __init__(self, path=None, ttl=None, max_entries=DEFAULT_MAX_ENTRIES, enabled=True, refresh=False) -> None:
+        self.path = expanduser(path) if path is not None else join(DEFAULT_CACHE_DIR, "metadata.json")
+        self.ttl = dict(DEFAULT_TTL, **(ttl or {}))
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self._lock = threading.RLock()
+        self.data = self.load() if enabled else {}
+
+    def load(self) -> dict:
+        """Read the cache file, starting fresh if it is missing or unreadable"""
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        for kind in DEFAULT_TTL.keys():
+            data.setdefault(kind, {"entries": {}, "names": {}})
+        return data
+
+    def save(self):
+        """Write the cache back to disk if anything changed"""
+        if not self.enabled or not self._dirty:
+            return
+        # Unique per writer, two runs for the same account can save at once
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self._lock:
+            try:
+                os.makedirs(dirname(self.path), exist_ok=True)
+                with open(tmp, 'w') as f:
+                    json.dump(self.data, f)
+                os.replace(tmp, self.path)
+            except OSError:
+                # The command already worked, a cache we couldn't write is only a slower next run
+                return
+            self._dirty = False
+
+    def lookup(self, kind: str, key):
+        """Return the cached raw data for an ID or name, or None if missing/expired"""
+        if not self.enabled or self.refresh:
+            return None
+        table = self.data[kind]
+        with self._lock:
+            if isinstance(key, int):
+                entry_id = str(key)
+            else:
+                entry_id = table["names"].get(str(key).lower())
+            entry = table["entries"].get(entry_id) if entry_id is not None else None
+            if entry is None or time.time() - entry["fetched"] > self.ttl[kind]:
+                return None
+            entry["accessed"] = time.time()
+            self._dirty = True
+            return entry["data"]
+
+    def store(self, kind: str, data: dict):
+        """Insert raw API data for an entity and evict the least recently used entries"""
+        if not self.enabled:
+            return
+        table = self.data[kind]
+        now = time.time()
+        with self._lock:
+            table["entries"][str(data["id"])] = {"data": data, "fetched": now, "accessed": now}
+            table["names"][data["name"].lower()] = str(data["id"])
+            self._dirty = True
+            self.evict(kind)
+
+    def invalidate(self, kind: str, entity_id: int):
+        """Forget an entity whose state we just changed (spawned, stopped, solved...)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self.data[kind]["entries"].pop(str(entity_id), None) is not None:
+                self._dirty = True
+
+    def evict(self, kind: str):
+        """Drop the least recently used entries once a table grows past max_entries"""
+        table = self.data[kind]
+        overflow = len(table["entries"]) - self.max_entries
+        if overflow <= 0:
+            return
+        oldest = sorted(table["entries"].items(), key=lambda e: e[1]["accessed"])[:overflow]
+        for entry_id, _ in oldest:
+            del table["entries"][entry_id]
+        table["names"] = {n: i for n, i in table["names"].items() if i in table["entries"]}
+
+    def get_challenge(self, client, name):
+        """Cached equivalent of client.get_challenge"""
+        from hackthebox import Challenge
+        data = self.lookup("challenge", name)
+        if data is None:
+            with self._lock:
+                self.misses += 1
+            data = client.do_request(f"challenge/info/{name}")['challenge']
+            self.store("challenge", data)
+        else:
+            with self._lock:
+                self.hits += 1
+        return Challenge(data, client)
+
+    def get_machine(self, client, name):
+        """Cached equivalent of client.get_machine"""
+        from hackthebox import Machine
+        data = self.lookup("machine", name)
+        if data is None:
+            with self._lock:
+                self.misses += 1
+            data = client.do_request(f"machine/profile/{name}")['info']
+            self.store("machine", data)
+        else:
+            with self._lock:
+                self.hits += 1
+        return Machine(data, client)
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        if not self.enabled:
+            return "metadata cache disabled"
+        return f"metadata cache: {self.hits} hit(s), {self.misses} miss(es) ({total} lookup(s)) @ {self.path}"
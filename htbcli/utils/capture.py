@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+import io
+import sys
+import threading
+from contextlib import contextmanager
+
+
+class ThreadLocalStream:
+    """Stand-in for sys.stdout/sys.stderr that sends each thread's writes to that thread's buffer, if it has one.
+
+    contextlib.redirect_stdout swaps the stream for the whole process, which
+    mixes up output as soon as more than one thread is printing.
+    """
+    def __init__(self, stream) -> None:
+        self.stream = stream
+        self.local = threading.local()
+
+    def _target(self):
+        return getattr(self.local, "buffer", None) or self.stream
+
+    def write(self, data):
+        return self._target().write(data)
+
+    def flush(self):
+        self._target().flush()
+
+    def isatty(self):
+        # Captured output is read back later, never drawn on a terminal
+        return getattr(self.local, "buffer", None) is None and self.stream.isatty()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+_install_lock = threading.Lock()
+
+
+def _install(name: str) -> ThreadLocalStream:
+    with _install_lock:
+        current = getattr(sys, name)
+        if not isinstance(current, ThreadLocalStream):
+            current = ThreadLocalStream(current)
+            setattr(sys, name, current)
+        return current
+
+
+def current_buffer():
+    """The buffer the current thread's output is captured into, or None"""
+    stream = sys.stdout
+    return getattr(stream.local, "buffer", None) if isinstance(stream, ThreadLocalStream) else None
+
+
+@contextmanager
+def into(buffer):
+    """Send the current thread's output to buffer, e.g. one another thread got from capture(). None leaves it alone"""
+    if buffer is None:
+        yield buffer
+        return
+    streams = [_install("stdout"), _install("stderr")]
+    previous = [getattr(stream.local, "buffer", None) for stream in streams]
+    for stream in streams:
+        stream.local.buffer = buffer
+    try:
+        yield buffer
+    finally:
+        for stream, old in zip(streams, previous):
+            stream.local.buffer = old
+
+
+@contextmanager
+def capture():
+    """Collect everything the current thread prints to stdout and stderr in one StringIO"""
+    with into(io.StringIO()) as buffer:
+        yield buffer
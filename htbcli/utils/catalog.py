@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from os.path import expanduser, join, dirname
+
+from htbcli.utils.cache import DEFAULT_CACHE_DIR
+from htbcli.utils.index import LIST_ENDPOINTS, SYNC_INTERVAL
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entities (
+    kind TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    category TEXT,
+    difficulty TEXT,
+    os TEXT,
+    points INTEGER,
+    solved INTEGER,
+    retired INTEGER,
+    description TEXT,
+    released TEXT,
+    digest TEXT,
+    PRIMARY KEY (kind, id)
+);
+CREATE INDEX IF NOT EXISTS entities_difficulty ON entities (kind, difficulty);
+CREATE INDEX IF NOT EXISTS entities_category ON entities (kind, category);
+CREATE INDEX IF NOT EXISTS entities_os ON entities (kind, os);
+CREATE INDEX IF NOT EXISTS entities_points ON entities (kind, points);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+# Full text search over names and descriptions, kept in step with entities by triggers
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS entities_fts USING fts5(
+    name, description, content='entities', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS entities_ai AFTER INSERT ON entities BEGIN
+    INSERT INTO entities_fts (rowid, name, description) VALUES (new.rowid, new.name, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS entities_ad AFTER DELETE ON entities BEGIN
+    INSERT INTO entities_fts (entities_fts, rowid, name, description) VALUES ('delete', old.rowid, old.name, old.description);
+END;
+CREATE TRIGGER IF NOT EXISTS entities_au AFTER UPDATE ON entities BEGIN
+    INSERT INTO entities_fts (entities_fts, rowid, name, description) VALUES ('delete', old.rowid, old.name, old.description);
+    INSERT INTO entities_fts (rowid, name, description) VALUES (new.rowid, new.name, new.description);
+END;
+"""
+
+COLUMNS = ("kind", "id", "name", "category", "difficulty", "os", "points", "solved", "retired", "description", "released")
+
+
+def machine_row(data: dict, retired: bool) -> dict:
+    return {
+        "kind": "machine", "id": data["id"], "name": data["name"], "category": None,
+        "difficulty": data.get("difficultyText"), "os": data.get("os"), "points": data.get("points"),
+        "solved": int(bool(data.get("authUserInUserOwns")) and bool(data.get("authUserInRootOwns"))),
+        "retired": int(retired), "description": data.get("description"), "released": data.get("release"),
+    }
+
+
+def challenge_row(data: dict, retired: bool, categories: dict) -> dict:
+    return {
+        "kind": "challenge", "id": data["id"], "name": data["name"],
+        "category": data.get("category_name") or categories.get(data.get("challenge_category_id")),
+        "difficulty": data.get("difficulty"), "os": None, "points": int(data.get("points") or 0),
+        "solved": int(bool(data.get("authUserSolve"))), "retired": int(retired),
+        "description": data.get("description"), "released": data.get("release_date"),
+    }
+
+
+class Catalog:
+    """Local SQLite copy of the machine/challenge lists, searchable without touching the API"""
+    def __init__(self, path=None) -> None:
+        self.path = expanduser(path) if path is not None else join(DEFAULT_CACHE_DIR, "catalog.db")
+        os.makedirs(dirname(self.path), exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+        try:
+            self.db.executescript(FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5, text queries fall back to LIKE
+            self.fts = False
+
+    def close(self):
+        self.db.close()
+
+    def get_meta(self, key: str, default=None):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row["value"]) if row else default
+
+    def set_meta(self, key: str, value):
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def count(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM entities").fetchone()[0]
+
+    def upsert(self, rows) -> tuple:
+        """Insert or update rows, skipping ones whose content hasn't changed. Returns (added, updated)"""
+        added = updated = 0
+        for row in rows:
+            digest = hashlib.sha1(json.dumps(row, sort_keys=True, default=str).encode()).hexdigest()
+            existing = self.db.execute("SELECT digest FROM entities WHERE kind = ? AND id = ?",
+                                       (row["kind"], row["id"])).fetchone()
+            if existing is not None and existing["digest"] == digest:
+                continue
+            # Lists don't always carry descriptions, keep any we already have
+            if row["description"] is None and existing is not None:
+                row = dict(row, description=self.db.execute(
+                    "SELECT description FROM entities WHERE kind = ? AND id = ?", (row["kind"], row["id"])).fetchone()[0])
+            values = [row[c] for c in COLUMNS] + [digest]
+            if existing is None:
+                self.db.execute(f"INSERT INTO entities ({', '.join(COLUMNS)}, digest) VALUES ({', '.join('?' * (len(COLUMNS) + 1))})", values)
+                added += 1
+            else:
+                assignments = ', '.join(f"{c} = ?" for c in COLUMNS[2:])
+                self.db.execute(f"UPDATE entities SET {assignments}, digest = ? WHERE kind = ? AND id = ?",
+                                values[2:] + [row["kind"], row["id"]])
+                updated += 1
+        return added, updated
+
+    def challenge_categories(self, client) -> dict:
+        categories = self.get_meta("challenge_categories")
+        if categories is None:
+            try:
+                categories = {str(c["id"]): c["name"] for c in client.do_request("challenge/categories/list")["info"]}
+            except Exception:
+                categories = {}
+            self.set_meta("challenge_categories", categories)
+        return {int(k): v for k, v in categories.items()}
+
+    def sync(self, client, kinds=("machine", "challenge"), full=False, index=None) -> dict:
+        """Pull whichever list endpoints are due (all of them with full) and merge them in.
+
+        Entries that drop off an active list are marked retired, so the retired
+        lists only need pulling occasionally. If a NameIndex is passed it's fed
+        from the same responses.
+        """
+        stats = {"added": 0, "updated": 0, "retired": 0, "fetched": 0}
+        for kind in kinds:
+            categories = self.challenge_categories(client) if kind == "challenge" else {}
+            for listing, (endpoint, key) in LIST_ENDPOINTS[kind].items():
+                synced = self.get_meta(f"synced:{kind}:{listing}")
+                if not full and synced is not None and time.time() - synced < SYNC_INTERVAL[listing] and self.count():
+                    continue
+                entries = client.do_request(endpoint)[key]
+                retired = listing == "retired"
+                if kind == "machine":
+                    rows = [machine_row(e, retired) for e in entries]
+                else:
+                    rows = [challenge_row(e, retired, categories) for e in entries]
+                added, updated = self.upsert(rows)
+                stats["added"] += added
+                stats["updated"] += updated
+                stats["fetched"] += len(entries)
+                if not retired:
+                    ids = [r["id"] for r in rows]
+                    cur = self.db.execute(
+                        f"UPDATE entities SET retired = 1, digest = NULL WHERE kind = ? AND retired = 0 "
+                        f"AND id NOT IN ({', '.join('?' * len(ids)) or 'NULL'})", [kind] + ids)
+                    stats["retired"] += cur.rowcount
+                self.set_meta(f"synced:{kind}:{listing}", time.time())
+                if index is not None:
+                    index.update(kind, entries)
+                    index.data[kind]["synced"][listing] = time.time()
+        self.db.commit()
+        return stats
+
+    def search(self, text=None, kind=None, category=None, difficulty=None, os_name=None, min_points=None,
+               max_points=None, solved=None, retired=None, limit=25) -> list:
+        clauses, params = [], []
+        if text:
+            if self.fts:
+                # Quote each word so user input can't be read as FTS syntax, and prefix-match it
+                query = ' '.join('"' + word.replace('"', '""') + '"*' for word in text.split())
+                clauses.append("rowid IN (SELECT rowid FROM entities_fts WHERE entities_fts MATCH ?)")
+                params.append(query)
+            else:
+                clauses.append("(name LIKE ? OR description LIKE ?)")
+                params += [f"%{text}%", f"%{text}%"]
+        for column, value in (("kind", kind), ("category", category), ("difficulty", difficulty), ("os", os_name)):
+            if value is not None:
+                clauses.append(f"{column} = ? COLLATE NOCASE")
+                params.append(value)
+        if min_points is not None:
+            clauses.append("points >= ?")
+            params.append(min_points)
+        if max_points is not None:
+            clauses.append("points <= ?")
+            params.append(max_points)
+        if solved is not None:
+            clauses.append("solved = ?")
+            params.append(int(solved))
+        if retired is not None:
+            clauses.append("retired = ?")
+            params.append(int(retired))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self.db.execute(f"SELECT * FROM entities {where} ORDER BY kind, name COLLATE NOCASE LIMIT ?",
+                               params + [limit]).fetchall()
@@ -1,8 +1,15 @@
-from colorama import *
+# Plain ANSI escapes (the same codes colorama's Fore uses) so importing the
+# colors doesn't pull in any third-party modules on the startup path.
+BLUE = "\033[34m"
+YELLOW = "\033[33m"
+GREEN = "\033[32m"
+CYAN = "\033[36m"
+RED = "\033[31m"
+RESET = "\033[39m"
 
 # Print statement colors
-info = (Fore.BLUE + "[*]" + Fore.RESET + " ")
-recc = (Fore.YELLOW + "[*]" + Fore.RESET + " ")
-good = (Fore.GREEN + "[+]" + Fore.RESET + " ")
-important = (Fore.CYAN + "[!]" + Fore.RESET + " ")
-printError = (Fore.RED + "[X]" + Fore.RESET + " ")
\ No newline at end of file
+info = (BLUE + "[*]" + RESET + " ")
+recc = (YELLOW + "[*]" + RESET + " ")
+good = (GREEN + "[+]" + RESET + " ")
+important = (CYAN + "[!]" + RESET + " ")
+printError = (RED + "[X]" + RESET + " ")
\ No newline at end of file
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+import base64
+import getpass
+import json
+import os
+import threading
+import time
+from os.path import expanduser, join, dirname
+
+CONFIG_DIR = join(os.environ.get("XDG_CONFIG_HOME") or expanduser("~/.config"), "htbcli")
+DEFAULT_STORE = join(CONFIG_DIR, "credentials.json")
+DEFAULT_ENCRYPTED_STORE = join(CONFIG_DIR, "credentials.enc")
+KEYRING_SERVICE = "htbcli"
+# Refresh the access token this many seconds before it expires, so no request is sent with one about to lapse
+REFRESH_SKEW = 300
+# How often the agent checks whether its tokens need refreshing
+REFRESH_CHECK_INTERVAL = 60
+PBKDF2_ITERATIONS = 390000
+
+
+def token_expiry(token: str):
+    """The exp claim of a JWT as a timestamp, or None if it can't be read"""
+    try:
+        payload = token.split('.')[1]
+        return float(json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))['exp'])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def expires_soon(token: str, skew=REFRESH_SKEW) -> bool:
+    """Whether token expires within skew seconds. Tokens we can't read are left for the API to judge"""
+    expiry = token_expiry(token)
+    return expiry is not None and time.time() + skew >= expiry
+
+
+def write_private(path: str, data: bytes):
+    """Write data to path readable by the owner only, replacing it atomically"""
+    path = expanduser(path)
+    os.makedirs(dirname(path) or ".", mode=0o700, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+    # In case the file existed with looser permissions before
+    os.chmod(path, 0o600)
+
+
+class FileBackend:
+    """Tokens as JSON in a file only the owner can read"""
+    def __init__(self, path=DEFAULT_STORE) -> None:
+        self.path = expanduser(path)
+
+    def read(self):
+        try:
+            with open(self.path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, data: bytes):
+        write_private(self.path, data)
+
+    def describe(self) -> str:
+        return self.path
+
+
+class EncryptedFileBackend(FileBackend):
+    """Tokens in a file encrypted with a passphrase (HTBCLI_STORE_PASSPHRASE, or asked for), needs cryptography"""
+    def __init__(self, path=DEFAULT_ENCRYPTED_STORE, passphrase=None) -> None:
+        super().__init__(path)
+        try:
+            from cryptography.fernet import Fernet, InvalidToken
+        except ImportError:
+            raise ValueError("The encrypted store needs cryptography installed (pip install cryptography), or use --store file/keyring")
+        self._fernet = Fernet
+        self._invalid = InvalidToken
+        self._passphrase = passphrase
+        self._keys = {}
+
+    def _key(self, salt: bytes) -> bytes:
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+        if salt not in self._keys:
+            if self._passphrase is None:
+                self._passphrase = os.environ.get("HTBCLI_STORE_PASSPHRASE") or getpass.getpass("Credential store passphrase: ")
+            kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=PBKDF2_ITERATIONS)
+            self._keys[salt] = base64.urlsafe_b64encode(kdf.derive(self._passphrase.encode()))
+        return self._keys[salt]
+
+    def read(self):
+        blob = super().read()
+        if blob is None:
+            return None
+        salt, token = blob[:16], blob[16:]
+        try:
+            return self._fernet(self._key(salt)).decrypt(token)
+        except self._invalid:
+            raise ValueError(f"Couldn't decrypt {self.path}, wrong passphrase?")
+
+    def write(self, data: bytes):
+        # Keep the salt once there is one, so the key is only derived once per run
+        salt = next(iter(self._keys), None) or os.urandom(16)
+        super().write(salt + self._fernet(self._key(salt)).encrypt(data))
+
+
+class KeyringBackend:
+    """Tokens in the OS keyring (Keychain, Secret Service, Windows Credential Locker), needs keyring"""
+    def __init__(self, account="default") -> None:
+        try:
+            import keyring
+        except ImportError:
+            raise ValueError("The keyring store needs keyring installed (pip install keyring), or use --store file/encrypted")
+        self.keyring = keyring
+        self.account = account
+
+    def read(self):
+        data = self.keyring.get_password(KEYRING_SERVICE, self.account)
+        return data.encode() if data is not None else None
+
+    def write(self, data: bytes):
+        self.keyring.set_password(KEYRING_SERVICE, self.account, data.decode())
+
+    def describe(self) -> str:
+        return f"keyring ({KEYRING_SERVICE}/{self.account})"
+
+
+BACKENDS = {"file": FileBackend, "encrypted": EncryptedFileBackend, "keyring": KeyringBackend}
+
+
+def store_identity(spec: str) -> str:
+    """A stable name for the login a --store spec points at, without opening it"""
+    kind, _, where = spec.partition(':')
+    if kind == "keyring":
+        return f"keyring:{where or 'default'}"
+    default = DEFAULT_ENCRYPTED_STORE if kind == "encrypted" else DEFAULT_STORE
+    return f"{kind}:{os.path.realpath(expanduser(where or default))}"
+
+
+class CredentialStore:
+    """Where logins are kept between runs, so only the first one asks for a password"""
+    def __init__(self, backend) -> None:
+        self.backend = backend
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_spec(cls, spec: str):
+        """file, encrypted or keyring, optionally followed by :PATH (:ACCOUNT for keyring)"""
+        kind, _, where = spec.partition(':')
+        if kind not in BACKENDS:
+            raise ValueError(f"Unknown credential store '{kind}', use one of {', '.join(BACKENDS)}")
+        return cls(BACKENDS[kind](where) if where else BACKENDS[kind]())
+
+    def load(self):
+        """The saved tokens, or None if nothing was saved yet"""
+        data = self.backend.read()
+        if not data:
+            return None
+        try:
+            tokens = json.loads(data)
+        except ValueError:
+            return None
+        if not tokens.get("app_token") and not tokens.get("refresh_token"):
+            return None
+        return tokens
+
+    def save(self, tokens: dict):
+        with self._lock:
+            self.backend.write(json.dumps(tokens).encode())
+
+    def describe(self) -> str:
+        return self.backend.describe()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+import hashlib
+import os
+import re
+import sys
+import time
+from os.path import exists, getsize
+
+import requests
+from hackthebox import *
+from hackthebox.constants import DOWNLOAD_COOLDOWN
+
+CHUNK_SIZE = 64 * 1024
+MAX_ATTEMPTS = 3
+VPN_NOT_ASSIGNED = b'You are not assigned'
+
+
+class DownloadError(Exception):
+    """The transfer finished but the file doesn't match what the server promised"""
+
+
+class Progress:
+    """Single-line transfer progress on stderr, only drawn when stderr is a terminal"""
+    def __init__(self, label: str, enabled=True) -> None:
+        self.label = label
+        self.enabled = enabled and sys.stderr.isatty()
+        self.start = time.perf_counter()
+        self.last = 0.0
+
+    def update(self, done: int, total=None, resumed=0, force=False):
+        now = time.perf_counter()
+        if not self.enabled or (not force and now - self.last < 0.1):
+            return
+        self.last = now
+        rate = (done - resumed) / max(now - self.start, 1e-6) / (1024 * 1024)
+        if total:
+            status = f"{done / (1024 * 1024):.2f}/{total / (1024 * 1024):.2f} MiB ({100 * done / total:.0f}%)"
+        else:
+            status = f"{done / (1024 * 1024):.2f} MiB"
+        sys.stderr.write(f"\r  {self.label}: {status} @ {rate:.2f} MiB/s\033[K")
+        sys.stderr.flush()
+
+    def finish(self):
+        if self.enabled:
+            sys.stderr.write("\n")
+
+
+def _expected_size(response, offset: int):
+    """Total file size from Content-Range (206) or Content-Length (200), if the server sent one"""
+    match = re.match(r"bytes \d+-\d+/(\d+)", response.headers.get("Content-Range", ""))
+    if match:
+        return int(match.group(1))
+    length = response.headers.get("Content-Length")
+    if length is not None and length.isdecimal():
+        return offset + int(length)
+    return None
+
+
+def _validator(response):
+    """What identifies this version of the file for If-Range: a strong ETag, else Last-Modified"""
+    etag = response.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("Last-Modified")
+
+
+def _read_validator(part: str):
+    try:
+        with open(part + ".validator", 'r') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _discard(part: str):
+    for leftover in (part, part + ".validator"):
+        if exists(leftover):
+            os.remove(leftover)
+
+
+def stream_download(client, endpoint: str, path: str, progress=True, expected_sha256=None):
+    """Stream an API download to path in constant memory, resuming from path.part if one exists.
+
+    A .part file is only resumed with If-Range and the validator of the
+    response it came from, so a file that changed on the server since isn't
+    spliced onto the old bytes. The finished file is checked against the size
+    the server reported (and expected_sha256 if given) before it is
+    atomically renamed into place. Returns (path, size, sha256).
+    """
+    part = path + ".part"
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        validator = _read_validator(part)
+        if exists(part) and validator is None:
+            # Nothing to tell the server which version these bytes belong to
+            _discard(part)
+        offset = getsize(part) if exists(part) else 0
+        headers = client.auth_headers()
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = validator
+        tracer = getattr(client, "tracer", None)
+        start = tracer.now() if tracer else 0
+        r, retries = client.send("GET", endpoint, headers=headers, stream=True)
+        expected = None
+        done = offset
+        try:
+            if r.status_code == 404:
+                raise errors.NotFoundException
+            if r.status_code == 416:
+                # Our partial file doesn't line up with the server's copy anymore
+                _discard(part)
+                continue
+            r.raise_for_status()
+            if r.status_code == 206 and r.headers.get("ETag") and validator != _validator(r):
+                # The server resumed anyway but the file changed under us
+                _discard(part)
+                continue
+            if r.status_code != 206:
+                # Server ignored the Range header or the file changed, start over
+                offset = 0
+                if _validator(r) is not None:
+                    with open(part + ".validator", 'w') as f:
+                        f.write(_validator(r))
+                elif exists(part + ".validator"):
+                    os.remove(part + ".validator")
+            expected = _expected_size(r, offset)
+
+            digest = hashlib.sha256()
+            if offset:
+                with open(part, 'rb') as f:
+                    for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                        digest.update(chunk)
+            bar = Progress(os.path.basename(path), progress)
+            done = offset
+            with open(part, 'ab' if offset else 'wb') as f:
+                for chunk in r.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    done += len(chunk)
+                    bar.update(done, expected, offset)
+            bar.update(done, expected, offset, force=True)
+            bar.finish()
+        except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError):
+            # Dropped mid-transfer, whatever made it into the .part file is kept for the retry
+            if attempt == MAX_ATTEMPTS:
+                raise
+            continue
+        finally:
+            r.close()
+            if tracer:
+                tracer.record("GET", endpoint, start, r.status_code, done - offset,
+                              retries=attempt - 1 + retries, rate_limited=retries)
+
+        if expected is not None and done != expected:
+            # Keep the .part file around so the next attempt resumes from it
+            if attempt == MAX_ATTEMPTS:
+                raise DownloadError(f"expected {expected} bytes, got {done}")
+            continue
+        sha256 = digest.hexdigest()
+        if expected_sha256 is not None and sha256 != expected_sha256:
+            _discard(part)
+            raise DownloadError(f"checksum mismatch for {path}")
+        os.replace(part, path)
+        if exists(part + ".validator"):
+            os.remove(part + ".validator")
+        return path, done, sha256
+    raise DownloadError(f"couldn't download {endpoint} after {MAX_ATTEMPTS} attempts")
+
+
+def download_challenge(client, chall, path: str, progress=True):
+    """Streaming replacement for Challenge.download that keeps the upstream download cooldown"""
+    if not chall.has_download:
+        raise errors.NoDownloadException
+    if client.challenge_cooldown > time.time():
+        raise errors.RateLimitException("Challenge download ratelimit exceeded - please do not remove this")
+    result = stream_download(client, f"challenge/download/{chall.id}", path, progress)
+    client.challenge_cooldown = int(time.time()) + DOWNLOAD_COOLDOWN
+    return result
+
+
+def download_vpn_config(client, server, path: str, tcp=False, progress=False):
+    """Streaming replacement for VPNServer.download, switching servers first if we aren't assigned to it"""
+    url = f"access/ovpnfile/{server.id}/0"
+    if tcp:
+        url += "/1"
+    result = stream_download(client, url, path, progress)
+    # Error responses are tiny JSON bodies, real configs are a few KB
+    if result[1] < 4096:
+        with open(path, 'rb') as f:
+            if VPN_NOT_ASSIGNED in f.read():
+                server.switch()
+                result = stream_download(client, url, path, progress)
+                if result[1] < 4096:
+                    with open(path, 'rb') as f:
+                        if VPN_NOT_ASSIGNED in f.read():
+                            os.remove(path)
+                            raise errors.VpnException(f"still not assigned to {server.friendly_name} after switching to it")
+    return result
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+import json
+import re
+from os.path import basename, expanduser, splitext
+
+# What fleet mode knows how to fan out, per subcommand
+FLEET_ACTIONS = {
+    "machine": ("spawn", "stop", "reset"),
+    "challenge": ("start_docker",),
+    "vpn": ("download",),
+}
+_ANSI = re.compile(r"\x1b\[[0-9;]*m")
+
+
+def load_profiles(path: str) -> dict:
+    """Read account name -> credential cache path from a profiles file.
+
+    Either a JSON object ({"alice": "~/htb/alice.json", ...}) or one cache per
+    line, as "name=path" or just a path (named after the file).
+    """
+    with open(expanduser(path), 'r') as f:
+        text = f.read()
+    if text.lstrip().startswith('{'):
+        profiles = json.loads(text)
+        if not all(isinstance(v, str) for v in profiles.values()):
+            raise ValueError("profiles JSON must map names to credential cache paths")
+    else:
+        profiles = {}
+        for lineno, line in enumerate(text.splitlines(), 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            name, sep, cache = line.partition('=')
+            if not sep:
+                name, cache = splitext(basename(line))[0], line
+            name, cache = name.strip(), cache.strip()
+            if name in profiles:
+                raise ValueError(f"line {lineno}: duplicate profile '{name}'")
+            profiles[name] = cache
+    if not profiles:
+        raise ValueError("no profiles listed")
+    return {name: expanduser(cache) for name, cache in profiles.items()}
+
+
+def check_fleet_args(args, profiles=1):
+    """Error message if this invocation can't be fanned out across that many accounts, else None"""
+    actions = FLEET_ACTIONS.get(args.subcommand)
+    if actions is None:
+        return f"--profiles works with {', '.join(FLEET_ACTIONS)}, not {args.subcommand}"
+    if not any(getattr(args, a) for a in actions):
+        return f"--profiles only fans out {args.subcommand} " + "/".join("--" + a.replace('_', '-') for a in actions)
+    if args.subcommand == "vpn" and args.switch is not None and args.switch.lower() == "menu":
+        return "--switch menu needs a terminal, pick a server by name or use auto with --profiles"
+    if args.subcommand == "vpn" and args.download is not None and profiles > 1 and "{profile}" not in args.download:
+        # Every account's config holds its own key, they must not overwrite each other
+        return "-d needs {profile} in the path with more than one profile, e.g. vpn/{profile}.ovpn or vpn/{profile}/"
+    if args.subcommand == "challenge" and args.bulk is not None:
+        return "--bulk can't be combined with --profiles"
+    return None
+
+
+def profile_argv(argv: list, name: str, cache: str) -> list:
+    """argv for one account: no --profiles, that account's -c cache, and {profile} filled in"""
+    out = ["-c", cache, "--no-agent"]
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+            continue
+        if arg in ("--profiles", "--fleet-workers", "-c", "--cache"):
+            skip = True
+            continue
+        if arg.startswith(("--profiles=", "--fleet-workers=", "--cache=")):
+            continue
+        out.append(arg.replace("{profile}", name))
+    return out
+
+
+def summarize(output: str) -> str:
+    """Last result line ([+], [!] or [X]) of an account's output, without colours or the prefix"""
+    lines = [_ANSI.sub('', l).strip() for l in output.splitlines()]
+    results = [l for l in lines if l.startswith(("[+]", "[!]", "[X]"))]
+    lines = results or [l for l in lines if l and not l.startswith('─')]
+    return re.sub(r"^\[.\]\s*", '', lines[-1]) if lines else ''
+
+
+def print_table(results: list):
+    """Per-account status table, results are dicts with profile, ok, seconds and detail"""
+    width = max([7] + [len(r["profile"]) for r in results])
+    print('─'*100)
+    print(f"{'account':<{width}}  {'status':<6}  {'secs':>6}  detail")
+    for r in results:
+        status = "ok" if r["ok"] else "FAILED"
+        print(f"{r['profile']:<{width}}  {status:<6}  {r['seconds']:>6.1f}  {r['detail'][:100 - width - 20]}")
+    print('─'*100)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+import json
+import os
+import threading
+import time
+from difflib import get_close_matches
+from os.path import expanduser, join, dirname
+
+from htbcli.utils.cache import DEFAULT_CACHE_DIR
+
+# List endpoints to pull names from, per kind. Active lists change with every
+# release so they're refreshed often, retired lists barely move.
+LIST_ENDPOINTS = {
+    "machine": {"active": ("machine/list", "info"), "retired": ("machine/list/retired", "info")},
+    "challenge": {"active": ("challenge/list", "challenges"), "retired": ("challenge/list/retired", "challenges")},
+}
+SYNC_INTERVAL = {
+    "active": 24 * 60 * 60,
+    "retired": 7 * 24 * 60 * 60,
+}
+
+
+class NameIndex:
+    """Persistent name -> ID index for machines and challenges, filled from the list endpoints."""
+    def __init__(self, path=None) -> None:
+        self.path = expanduser(path) if path is not None else join(DEFAULT_CACHE_DIR, "index.json")
+        self._dirty = False
+        self.data = self.load()
+
+    def load(self) -> dict:
+        """Read the index file, starting fresh if it is missing or unreadable"""
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        for kind in LIST_ENDPOINTS.keys():
+            data.setdefault(kind, {"names": {}, "synced": {}})
+        return data
+
+    def save(self):
+        """Write the index back to disk if anything changed"""
+        if not self._dirty:
+            return
+        os.makedirs(dirname(self.path), exist_ok=True)
+        # Unique per writer, fleet mode can have several indexes saving at once
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.data, f)
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+    def update(self, kind: str, entries):
+        """Merge (name, id) pairs from any list response into the index"""
+        names = self.data[kind]["names"]
+        for entry in entries:
+            names[entry["name"].lower()] = [entry["id"], entry["name"]]
+        self._dirty = True
+
+    def stale(self, kind: str, listing="active") -> bool:
+        synced = self.data[kind]["synced"].get(listing)
+        return synced is None or time.time() - synced > SYNC_INTERVAL[listing]
+
+    def sync(self, client, kind: str, full=False) -> int:
+        """Pull the list endpoints that are due (or all of them with full), returns the number of names seen"""
+        seen = 0
+        for listing, (endpoint, key) in LIST_ENDPOINTS[kind].items():
+            if not full and not self.stale(kind, listing):
+                continue
+            entries = client.do_request(endpoint)[key]
+            self.update(kind, entries)
+            self.data[kind]["synced"][listing] = time.time()
+            seen += len(entries)
+        return seen
+
+    def exact(self, kind: str, name: str):
+        """(id, name) for a name the index knows as is, ignoring case, or None"""
+        match = self.data[kind]["names"].get(name.lower().strip())
+        return tuple(match) if match is not None else None
+
+    def candidates(self, kind: str, name: str, n=5) -> list:
+        """Names that could be meant by name, for telling the user what to pick from"""
+        names = self.data[kind]["names"]
+        key = name.lower().strip()
+        close = [m for m in names.keys() if m.startswith(key)] + get_close_matches(key, names.keys(), n=n, cutoff=0.6)
+        return [names[m][1] for m in dict.fromkeys(close)][:n]
+
+    def resolve(self, kind: str, name: str):
+        """Match a name exactly, then by unique prefix, then fuzzily. Returns (id, name) or None"""
+        names = self.data[kind]["names"]
+        key = name.lower().strip()
+        if key in names:
+            return tuple(names[key])
+        prefixed = [n for n in names.keys() if n.startswith(key)]
+        if len(prefixed) == 1:
+            return tuple(names[prefixed[0]])
+        close = get_close_matches(key, names.keys(), n=1, cutoff=0.85)
+        if close:
+            return tuple(names[close[0]])
+        return None
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+import json
+import os
+import threading
+import time
+from os.path import expanduser, join, dirname
+
+from htbcli.utils.cache import DEFAULT_CACHE_DIR
+
+
+class DockerTracker:
+    """Local record of the challenge dockers we started, the API has no endpoint listing them"""
+    def __init__(self, path=None) -> None:
+        self.path = expanduser(path) if path is not None else join(DEFAULT_CACHE_DIR, "dockers.json")
+
+    def load(self) -> dict:
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, data: dict):
+        os.makedirs(dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+    def add(self, chall_id: int, name: str, address: str):
+        data = self.load()
+        data[str(chall_id)] = {"name": name, "address": address, "started": time.time()}
+        self._save(data)
+
+    def remove(self, chall_id: int):
+        data = self.load()
+        if data.pop(str(chall_id), None) is not None:
+            self._save(data)
+
+    def all(self) -> dict:
+        return self.load()
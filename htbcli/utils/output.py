@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+import json
+import re
+import sys
+import threading
+import time
+
+from htbcli.utils.colors import good, info, important, printError, recc
+
+MODES = ("text", "json", "ndjson")
+# Exit codes, sysexits-style where one fits
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2
+EXIT_RATE_LIMITED = 75
+
+_LEVELS = ((good, "success"), (printError, "error"), (important, "warning"), (info, "info"), (recc, "info"))
+_ANSI = re.compile(r"\x1b\[[0-9;]*m")
+# Continuation lines like "  \\--> Server: ..." under a result
+_CONTINUATION = re.compile(r"^\\*-->\s*")
+
+
+def split_message(message: str):
+    """(level, plain text) for a message built with one of the colors prefixes"""
+    for prefix, level in _LEVELS:
+        if message.startswith(prefix):
+            return level, message[len(prefix):]
+    return "info", _CONTINUATION.sub('', _ANSI.sub('', message).strip())
+
+
+class Emitter:
+    """Where connectors report what happened.
+
+    Every event is kept in events. In text mode its message is printed as
+    before; in ndjson mode each event is written as a JSON line as it happens;
+    in json mode they're written as one document by finish().
+    """
+    def __init__(self, mode="text", stream=None) -> None:
+        self.mode = mode
+        self.stream = stream or sys.stdout
+        self.events = []
+        self.failed = False
+        self._lock = threading.Lock()
+
+    def emit(self, event: str, message=None, **fields) -> dict:
+        level, text = split_message(message) if message is not None else ("info", None)
+        level = fields.pop("level", level)
+        record = {"event": event, "level": level, "time": round(time.time(), 3)}
+        if text is not None:
+            record["message"] = text
+        record.update(fields)
+        with self._lock:
+            self.events.append(record)
+            if level == "error":
+                self.failed = True
+            if self.mode == "ndjson":
+                self.stream.write(json.dumps(record, default=str) + "\n")
+                self.stream.flush()
+        if self.mode == "text" and message is not None:
+            print(message)
+        return record
+
+    def exit_code(self, code=None) -> int:
+        """Exit code for the run, an explicit non-zero code wins, otherwise any error event makes it 1"""
+        if isinstance(code, int) and code != EXIT_OK:
+            return code
+        if code is not None and not isinstance(code, int):
+            # exit("message") style
+            return EXIT_ERROR
+        return EXIT_ERROR if self.failed else EXIT_OK
+
+    def finish(self, code: int):
+        if self.mode == "json":
+            json.dump({"ok": code == EXIT_OK, "exit_code": code, "events": self.events}, self.stream, default=str)
+            self.stream.write("\n")
+        elif self.mode == "ndjson":
+            self.stream.write(json.dumps({"event": "exit", "level": "info" if code == EXIT_OK else "error",
+                                          "exit_code": code}) + "\n")
+        self.stream.flush()
+
+
+_default = Emitter()
+_local = threading.local()
+
+
+def get_emitter() -> Emitter:
+    return getattr(_local, "emitter", None) or _default
+
+
+def set_emitter(emitter: Emitter, thread_only=False):
+    """Make emitter the process-wide one, or just the current thread's (fleet workers)"""
+    global _default
+    if thread_only:
+        _local.emitter = emitter
+    else:
+        _default = emitter
+
+
+def emit(event: str, message=None, **fields) -> dict:
+    """Report an event through the current emitter"""
+    return get_emitter().emit(event, message, **fields)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from htbcli.utils import capture
+from htbcli.utils.colors import info
+from htbcli.utils.output import emit, get_emitter, set_emitter
+
+# Width of the bars in the text timeline
+BAR_WIDTH = 40
+
+
+class Pipeline:
+    """Runs the actions of one command concurrently, each after the actions it was added after.
+
+    Actions report through the caller's emitter, captured output and profiler
+    phase, so --output json, fleet mode and --profile see them as if they ran
+    in order. When every action started and finished is kept for timeline().
+    """
+    def __init__(self, tracer=None) -> None:
+        self.tracer = tracer
+        self.actions = []
+        self.timings = {}
+
+    def add(self, name: str, func, *args, after=(), phase="action"):
+        """Queue func(*args) as action name, to start once the actions named in after are done"""
+        self.actions.append({"name": name, "func": func, "args": args, "after": tuple(after), "phase": phase})
+
+    def run(self) -> dict:
+        """Run everything queued and return {name: result}, re-raising the first action that raised (e.g. exit())"""
+        if not self.actions:
+            return {}
+        emitter = get_emitter()
+        buffer = capture.current_buffer()
+        origin = time.monotonic()
+        futures = {}
+
+        def call(action):
+            for dependency in action["after"]:
+                # Dependencies only order things, a failed one doesn't stop what comes after (like running them in turn)
+                futures[dependency].exception()
+            set_emitter(emitter, thread_only=True)
+            try:
+                with capture.into(buffer), self._phase(action["phase"]):
+                    start = time.monotonic() - origin
+                    try:
+                        return action["func"](*action["args"])
+                    finally:
+                        self.timings[action["name"]] = (start, time.monotonic() - origin)
+            finally:
+                set_emitter(None, thread_only=True)
+
+        # One thread per action, so an action waiting on another never holds up one that could run
+        with ThreadPoolExecutor(max_workers=len(self.actions)) as pool:
+            for action in self.actions:
+                futures[action["name"]] = pool.submit(call, action)
+        for future in futures.values():
+            error = future.exception()
+            if error is not None:
+                raise error
+        return {name: future.result() for name, future in futures.items()}
+
+    def _phase(self, name: str):
+        if self.tracer is None:
+            return nullcontext()
+        return self.tracer.phase(name)
+
+    def timeline(self):
+        """Report when each action ran, as a timeline event and, in text mode, a bar per action"""
+        if len(self.timings) < 2:
+            return
+        rows = [{"action": name, "start_ms": round(start * 1000, 1), "end_ms": round(end * 1000, 1)}
+                for name, (start, end) in sorted(self.timings.items(), key=lambda t: t[1])]
+        emit("timeline", actions=rows)
+        if get_emitter().mode != "text":
+            return
+        total = max(r["end_ms"] for r in rows) or 1
+        print(info + "Timeline:")
+        for r in rows:
+            left = int(r["start_ms"] / total * BAR_WIDTH)
+            width = max(1, int((r["end_ms"] - r["start_ms"]) / total * BAR_WIDTH))
+            print(f"  {r['action']:<14} {' ' * left}{'█' * width:<{BAR_WIDTH - left}} "
+                  f"{r['start_ms']:>7.0f} - {r['end_ms']:.0f} ms")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+import json
+import os
+import socket
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from os.path import join, dirname
+
+from htbcli.utils.cache import DEFAULT_CACHE_DIR
+
+# HTB's OpenVPN edges are named after the server, e.g. "EU Free 1" -> edge-eu-free-1.hackthebox.eu.
+# 443 is what the TCP configs connect to, so it's a fair stand-in for the tunnel's RTT.
+DEFAULT_TARGET = "edge-{slug}.hackthebox.eu:443"
+DEFAULT_TTL = 10 * 60
+PROBE_ATTEMPTS = 3
+CONNECT_TIMEOUT = 2.0
+# How many milliseconds of RTT one connected client is worth when scoring
+LOAD_WEIGHT = 0.5
+
+
+def target_for(server, template=DEFAULT_TARGET):
+    """Fill a host:port template from a VPNServer ({slug}, {id}, {location} are available)"""
+    slug = server.friendly_name.lower().replace(' ', '-')
+    host, port = template.format(slug=slug, id=server.id, location=server.location.lower()).rsplit(':', 1)
+    return host, int(port)
+
+
+def tcp_rtt(host: str, port: int, attempts=PROBE_ATTEMPTS, timeout=CONNECT_TIMEOUT):
+    """Median TCP connect time in milliseconds, or None if the host never answered"""
+    samples = []
+    for _ in range(attempts):
+        start = time.perf_counter()
+        try:
+            with socket.create_connection((host, port), timeout=timeout):
+                samples.append((time.perf_counter() - start) * 1000)
+        except OSError:
+            continue
+    return statistics.median(samples) if samples else None
+
+
+class ProbeCache:
+    """Remembers recent probe results so repeated --switch auto runs don't re-probe every server"""
+    def __init__(self, path=None, ttl=DEFAULT_TTL) -> None:
+        self.path = path or join(DEFAULT_CACHE_DIR, "probes.json")
+        self.ttl = ttl
+        try:
+            with open(self.path, 'r') as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            self.data = {}
+
+    def get(self, key: str):
+        entry = self.data.get(key)
+        if entry is None or time.time() - entry["at"] > self.ttl:
+            return None
+        return entry
+
+    def put(self, key: str, rtt):
+        self.data[key] = {"rtt": rtt, "at": time.time()}
+
+    def save(self):
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(dirname(self.path), exist_ok=True)
+            with open(tmp, 'w') as f:
+                json.dump(self.data, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+
+def rank_servers(servers, template=DEFAULT_TARGET, workers=16, cache: ProbeCache = None, rtt_fn=tcp_rtt):
+    """Probe every server concurrently and return [(score, rtt, server)], best first.
+
+    Unreachable servers are left out. rtt_fn(host, port) can be swapped out for testing.
+    """
+    targets = {s.id: target_for(s, template) for s in servers}
+    rtts = {}
+    to_probe = []
+    for server in servers:
+        key = "%s:%d" % targets[server.id]
+        cached = cache.get(key) if cache is not None else None
+        if cached is not None:
+            rtts[server.id] = cached["rtt"]
+        else:
+            to_probe.append(server)
+
+    if to_probe:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(to_probe)))) as pool:
+            results = pool.map(lambda s: rtt_fn(*targets[s.id]), to_probe)
+            for server, rtt in zip(to_probe, results):
+                rtts[server.id] = rtt
+                if cache is not None:
+                    cache.put("%s:%d" % targets[server.id], rtt)
+        if cache is not None:
+            cache.save()
+
+    ranked = [(rtts[s.id] + LOAD_WEIGHT * s.current_clients, rtts[s.id], s)
+              for s in servers if rtts.get(s.id) is not None]
+    return sorted(ranked, key=lambda r: r[0])
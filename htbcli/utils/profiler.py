@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+import json
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Collapse IDs and names in endpoints so e.g. machine/profile/1 and machine/profile/2 group together
+_ID_PATTERN = re.compile(r"/(\d+|[0-9a-f]{24,})(?=/|$|\?)")
+
+
+def endpoint_group(endpoint: str) -> str:
+    endpoint = endpoint.split('?', 1)[0]
+    for prefix in ("machine/profile/", "challenge/info/", "challenge/download/"):
+        if endpoint.startswith(prefix):
+            return prefix + "{id}"
+    return _ID_PATTERN.sub("/{id}", endpoint)
+
+
+class Tracer:
+    """Records every API call made through SessionClient, tagged with the CLI phase it happened in"""
+    def __init__(self) -> None:
+        self.origin = time.perf_counter()
+        self.calls = []
+        self.phases = []
+        self._lock = threading.Lock()
+        # Phases are per thread so concurrent actions don't relabel each other's calls,
+        # threads that never entered one get the main thread's
+        self._main = "startup"
+        self._local = threading.local()
+
+    @property
+    def current(self) -> str:
+        return getattr(self._local, "phase", None) or self._main
+
+    def now(self) -> float:
+        return time.perf_counter() - self.origin
+
+    @contextmanager
+    def phase(self, name: str):
+        """Attribute calls made inside the block to the phase name (auth, lookup, action, download...)"""
+        main = threading.current_thread() is threading.main_thread()
+        previous = getattr(self._local, "phase", None)
+        self._local.phase = name
+        if main:
+            outer, self._main = self._main, name
+        start = self.now()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases.append({"phase": name, "start": start, "duration": self.now() - start})
+            self._local.phase = previous
+            if main:
+                self._main = outer
+
+    def record(self, method: str, endpoint: str, start: float, status=None, size=0, retries=0, rate_limited=0, error=None):
+        with self._lock:
+            self.calls.append({
+                "phase": self.current,
+                "method": method,
+                "endpoint": endpoint,
+                "start": start,
+                "duration": self.now() - start,
+                "status": status,
+                "bytes": size,
+                "retries": retries,
+                "rate_limited": rate_limited,
+                "error": error,
+                "thread": threading.get_ident(),
+            })
+
+    def summary(self) -> list:
+        """Per (phase, endpoint) aggregates, in the order they first happened"""
+        groups = {}
+        for call in self.calls:
+            key = (call["phase"], call["method"], endpoint_group(call["endpoint"]))
+            group = groups.setdefault(key, {"phase": key[0], "method": key[1], "endpoint": key[2], "calls": 0,
+                                            "total_ms": 0.0, "max_ms": 0.0, "bytes": 0, "retries": 0,
+                                            "rate_limited": 0, "errors": 0})
+            ms = call["duration"] * 1000
+            group["calls"] += 1
+            group["total_ms"] += ms
+            group["max_ms"] = max(group["max_ms"], ms)
+            group["bytes"] += call["bytes"]
+            group["retries"] += call["retries"]
+            group["rate_limited"] += call["rate_limited"]
+            group["errors"] += call["error"] is not None
+        return list(groups.values())
+
+    def print_summary(self, file=sys.stderr):
+        rows = self.summary()
+        print('─'*100, file=file)
+        print(f"{'phase':<10} {'endpoint':<44} {'calls':>5} {'total ms':>9} {'max ms':>8} {'KiB':>8} {'retry':>5} {'429':>4}", file=file)
+        for r in rows:
+            endpoint = f"{r['method']} {r['endpoint']}"
+            print(f"{r['phase']:<10} {endpoint[:44]:<44} {r['calls']:>5} {r['total_ms']:>9.1f} {r['max_ms']:>8.1f} "
+                  f"{r['bytes'] / 1024:>8.1f} {r['retries']:>5} {r['rate_limited']:>4}", file=file)
+        print('─'*100, file=file)
+        walls = {}
+        for p in self.phases:
+            walls[p["phase"]] = walls.get(p["phase"], 0) + p["duration"]
+        for name, wall in walls.items():
+            calls = [c for c in self.calls if c["phase"] == name]
+            print(f"{name:<10} {wall * 1000:>9.1f} ms wall, {len(calls)} request(s)", file=file)
+        print(f"{'total':<10} {self.now() * 1000:>9.1f} ms wall, {len(self.calls)} request(s)", file=file)
+
+    def chrome_trace(self) -> dict:
+        """Chrome/Perfetto trace-event JSON, with the summary table alongside"""
+        pid = os.getpid()
+        events = []
+        for p in self.phases:
+            events.append({"name": p["phase"], "cat": "phase", "ph": "X", "pid": pid, "tid": 0,
+                           "ts": p["start"] * 1e6, "dur": p["duration"] * 1e6})
+        for c in self.calls:
+            events.append({"name": f"{c['method']} {c['endpoint']}", "cat": c["phase"], "ph": "X", "pid": pid,
+                           "tid": c["thread"], "ts": c["start"] * 1e6, "dur": c["duration"] * 1e6,
+                           "args": {k: c[k] for k in ("status", "bytes", "retries", "rate_limited", "error")}})
+        return {"traceEvents": events, "displayTimeUnit": "ms", "summary": self.summary()}
+
+    def write(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f, indent=1)
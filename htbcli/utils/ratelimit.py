@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from os.path import join, dirname
+
+from htbcli.utils.cache import DEFAULT_CACHE_DIR
+
+try:
+    import fcntl
+except ImportError:
+    # No flock on Windows, the bucket is then only shared between threads
+    fcntl = None
+
+# HTB doesn't publish its limits. This stays well under what a logged-in
+# browser session gets away with, and the burst covers a normal single command.
+DEFAULT_RATE = 2.0
+DEFAULT_BURST = 10
+MAX_RETRIES = 5
+BASE_DELAY = 1.0
+MAX_DELAY = 60.0
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdecimal():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, retry_after=None) -> float:
+    """How long to sleep before retry number attempt: the server's Retry-After if given, else full-jitter backoff"""
+    if retry_after is not None:
+        return min(MAX_DELAY, retry_after) + random.uniform(0, 0.5)
+    return random.uniform(BASE_DELAY / 2, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+
+
+class RateLimiter:
+    """Token bucket for API requests, shared between threads and (through a locked file) htbcli processes.
+
+    A 429 from the server empties the bucket and blocks everyone until its
+    Retry-After has passed, so parallel invocations back off together.
+    """
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, path=None, shared=True) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.path = path or join(DEFAULT_CACHE_DIR, "ratelimit.json")
+        self.shared = shared and fcntl is not None
+        self.waited = 0.0
+        self._lock = threading.Lock()
+        self._local = {"tokens": float(burst), "updated": time.time(), "blocked_until": 0.0}
+
+    @classmethod
+    def from_env(cls):
+        """Limiter configured by HTBCLI_RATE_LIMIT ("RATE/BURST", or "off"), defaults otherwise"""
+        setting = os.environ.get("HTBCLI_RATE_LIMIT")
+        if not setting:
+            return cls()
+        if setting.lower() == "off":
+            return None
+        rate, _, burst = setting.partition('/')
+        return cls(float(rate), int(burst or DEFAULT_BURST))
+
+    @contextmanager
+    def _state(self):
+        """Exclusive access to the bucket state, from the shared file when possible"""
+        with self._lock:
+            fd = None
+            if self.shared:
+                try:
+                    os.makedirs(dirname(self.path), exist_ok=True)
+                    fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+                except OSError:
+                    fd = None
+            if fd is None:
+                yield self._local
+                return
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                try:
+                    state = json.loads(os.read(fd, 4096) or b"{}")
+                except ValueError:
+                    state = {}
+                for key, value in self._local.items():
+                    state.setdefault(key, value)
+                yield state
+                data = json.dumps(state).encode()
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.ftruncate(fd, 0)
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+
+    def _take(self) -> float:
+        """Take a token if there is one. Returns 0, or how long to wait before trying again"""
+        with self._state() as state:
+            now = time.time()
+            state["tokens"] = min(self.burst, state["tokens"] + max(0.0, now - state["updated"]) * self.rate)
+            state["updated"] = now
+            if state["blocked_until"] > now:
+                return state["blocked_until"] - now
+            if state["tokens"] >= 1:
+                state["tokens"] -= 1
+                return 0
+            return (1 - state["tokens"]) / self.rate
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            wait = self._take()
+            if wait <= 0:
+                return
+            self.waited += wait
+            time.sleep(wait)
+
+    def penalize(self, seconds: float):
+        """The server said slow down: hold every request back for the given number of seconds"""
+        with self._state() as state:
+            state["tokens"] = 0.0
+            state["updated"] = time.time()
+            state["blocked_until"] = max(state["blocked_until"], time.time() + seconds)
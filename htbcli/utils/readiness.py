@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+import asyncio
+import random
+import time
+
+DEFAULT_TIMEOUT = 300
+CONNECT_TIMEOUT = 3.0
+
+
+def backoff_delays(initial=1.0, maximum=15.0, factor=2.0):
+    """Exponential backoff with jitter: each delay is drawn from [initial/2, min(maximum, initial * factor^n)]"""
+    ceiling = initial
+    while True:
+        yield random.uniform(initial / 2, ceiling)
+        ceiling = min(maximum, ceiling * factor)
+
+
+def poll(check, timeout=DEFAULT_TIMEOUT, initial=1.0, maximum=15.0):
+    """Call check() until it returns something truthy, sleeping with jittered backoff in between.
+
+    Returns check()'s result, or None if the deadline passed first.
+    """
+    deadline = time.monotonic() + timeout
+    for delay in backoff_delays(initial, maximum):
+        result = check()
+        if result:
+            return result
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        time.sleep(min(delay, remaining))
+
+
+async def _port_open(host: str, port: int, timeout: float) -> bool:
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+
+async def _ports_open(host: str, ports, timeout: float) -> dict:
+    results = await asyncio.gather(*[_port_open(host, p, timeout) for p in ports])
+    return dict(zip(ports, results))
+
+
+def ports_open(host: str, ports, timeout=CONNECT_TIMEOUT) -> dict:
+    """Check all ports on host concurrently, returns {port: reachable}"""
+    return asyncio.run(_ports_open(host, list(ports), timeout))
+
+
+def wait_for_ports(host: str, ports, timeout=DEFAULT_TIMEOUT, closed=False) -> bool:
+    """Wait until every port accepts TCP connections (or, with closed, until none of them do)"""
+    def check():
+        state = ports_open(host, ports)
+        return all(not v for v in state.values()) if closed else all(state.values())
+    return bool(poll(check, timeout, initial=1.0, maximum=10.0))
+
+
+def parse_ports(value: str) -> list:
+    """argparse type for comma-separated port lists, e.g. 22,80,445"""
+    try:
+        ports = [int(p) for p in value.split(',') if p.strip()]
+    except ValueError:
+        raise ValueError(f"invalid port list: {value}")
+    if not ports or any(p < 1 or p > 65535 for p in ports):
+        raise ValueError(f"invalid port list: {value}")
+    return ports
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+import hashlib
+import json
+import os
+import threading
+import time
+from os.path import expanduser, join, exists
+
+from hackthebox import *
+
+from htbcli.utils.cache import DEFAULT_CACHE_DIR
+from htbcli.utils.credentials import write_private
+from htbcli.utils.download import VPN_NOT_ASSIGNED
+
+# Configs younger than this are used without asking the API, older ones are revalidated with a conditional GET
+DEFAULT_TTL = 24 * 60 * 60
+
+
+def config_key(server_id: int, tcp=False, release_arena=False) -> str:
+    return f"{server_id}/{'tcp' if tcp else 'udp'}/{'release_arena' if release_arena else 'lab'}"
+
+
+class VpnConfigCache:
+    """Content-addressed store of downloaded .ovpn files.
+
+    Configs live in objects/<sha256>.ovpn and index.json maps a
+    (server, protocol, release arena) key to one of them, with the ETag and
+    Last-Modified it came with so a stale entry costs a bodyless 304 to check.
+    Configs hold the account's own certificate and key, so give every account
+    its own path (see account_dir), and everything is kept owner-only.
+    """
+    def __init__(self, path=None, ttl=DEFAULT_TTL, enabled=True, refresh=False) -> None:
+        self.path = expanduser(path) if path is not None else join(DEFAULT_CACHE_DIR, "vpn")
+        self.ttl = ttl
+        self.enabled = enabled
+        self.refresh = refresh
+        self._lock = threading.Lock()
+        self.index = self.load() if enabled else {}
+        if enabled:
+            self._lock_down()
+
+    def _lock_down(self):
+        """Make the cache owner-only, including anything written before it was"""
+        for directory in (self.path, join(self.path, "objects")):
+            if exists(directory):
+                os.chmod(directory, 0o700)
+        for entry in self.index.values():
+            if exists(self.object_path(entry["sha256"])):
+                os.chmod(self.object_path(entry["sha256"]), 0o600)
+
+    def load(self) -> dict:
+        try:
+            with open(join(self.path, "index.json"), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            write_private(join(self.path, "index.json"), json.dumps(self.index).encode())
+
+    def object_path(self, sha256: str) -> str:
+        return join(self.path, "objects", f"{sha256}.ovpn")
+
+    def lookup(self, key: str):
+        """The index entry for key if its config is still on disk"""
+        entry = self.index.get(key)
+        if entry is None or not exists(self.object_path(entry["sha256"])):
+            return None
+        return entry
+
+    def store(self, key: str, data: bytes, etag=None, last_modified=None) -> dict:
+        if VPN_NOT_ASSIGNED in data:
+            raise errors.VpnException("refusing to cache an error response as a VPN config")
+        sha256 = hashlib.sha256(data).hexdigest()
+        target = self.object_path(sha256)
+        if not exists(target):
+            os.makedirs(self.path, mode=0o700, exist_ok=True)
+            write_private(target, data)
+        entry = {"sha256": sha256, "size": len(data), "etag": etag, "last_modified": last_modified,
+                 "checked": time.time()}
+        with self._lock:
+            self.index[key] = entry
+        self.save()
+        self.prune()
+        return entry
+
+    def touch(self, key: str, etag=None, last_modified=None):
+        """The server said the config hasn't changed, trust it for another ttl"""
+        with self._lock:
+            entry = self.index[key]
+            entry["checked"] = time.time()
+            entry["etag"] = etag or entry["etag"]
+            entry["last_modified"] = last_modified or entry["last_modified"]
+        self.save()
+
+    def prune(self):
+        """Remove config files no key points at anymore"""
+        used = {entry["sha256"] for entry in self.index.values()}
+        try:
+            names = os.listdir(join(self.path, "objects"))
+        except OSError:
+            return
+        for name in names:
+            if name.endswith(".ovpn") and name[:-len(".ovpn")] not in used:
+                try:
+                    os.remove(join(self.path, "objects", name))
+                except OSError:
+                    pass
+
+    def fetch(self, client, server, tcp=False, release_arena=False):
+        """Path of an up to date config for server, and whether it came from the cache without a download"""
+        key = config_key(server.id, tcp, release_arena)
+        entry = self.lookup(key) if self.enabled else None
+        if entry is not None and not self.refresh and time.time() - entry["checked"] < self.ttl:
+            return self.object_path(entry["sha256"]), True
+
+        url = f"access/ovpnfile/{server.id}/0" + ("/1" if tcp else "")
+        for attempt in range(2):
+            headers = client.auth_headers()
+            if entry is not None:
+                if entry["etag"]:
+                    headers["If-None-Match"] = entry["etag"]
+                if entry["last_modified"]:
+                    headers["If-Modified-Since"] = entry["last_modified"]
+            tracer = getattr(client, "tracer", None)
+            start = tracer.now() if tracer else 0
+            r, retries = client.send("GET", url, headers=headers)
+            if tracer:
+                tracer.record("GET", url, start, r.status_code, len(r.content), retries, retries)
+            if r.status_code == 304 and entry is not None:
+                self.touch(key, r.headers.get("ETag"), r.headers.get("Last-Modified"))
+                return self.object_path(entry["sha256"]), True
+            if r.status_code == 404:
+                raise errors.NotFoundException
+            r.raise_for_status()
+            # We can't download configs for servers we're not assigned to, error bodies are tiny JSON
+            if len(r.content) < 4096 and VPN_NOT_ASSIGNED in r.content:
+                if attempt == 0:
+                    server.switch()
+                    continue
+                raise errors.VpnException(f"still not assigned to {server.friendly_name} after switching to it")
+            break
+        if entry is not None and hashlib.sha256(r.content).hexdigest() == entry["sha256"]:
+            # No validators from the server, but nothing changed either
+            self.touch(key, r.headers.get("ETag"), r.headers.get("Last-Modified"))
+            return self.object_path(entry["sha256"]), True
+        entry = self.store(key, r.content, r.headers.get("ETag"), r.headers.get("Last-Modified"))
+        return self.object_path(entry["sha256"]), False
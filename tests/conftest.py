@@ -0,0 +1,75 @@
+import atexit
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+# htbcli works out its cache paths at import time, so point HOME somewhere disposable before anything imports it
+HOME = tempfile.mkdtemp(prefix="htbcli-tests-")
+os.environ["HOME"] = HOME
+os.environ.pop("XDG_CONFIG_HOME", None)
+os.environ.pop("HTBCLI_AGENT_SOCKET", None)
+os.environ["HTBCLI_RATE_LIMIT"] = "off"
+
+from mock_api import MockAPI  # noqa: E402
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(HOME, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def mock_server():
+    api = MockAPI(download_size=256 * 1024).start()
+    yield api
+    api.stop()
+
+
+@pytest.fixture
+def api(mock_server, monkeypatch):
+    mock_server.reset()
+    monkeypatch.setenv("HTBCLI_API_BASE", mock_server.base)
+    shutil.rmtree(os.path.join(HOME, ".cache"), ignore_errors=True)
+    return mock_server
+
+
+@pytest.fixture
+def client(api):
+    from htbcli.connectors.client import SessionClient
+    return SessionClient(app_token="test", api_base=api.base)
+
+
+@pytest.fixture
+def cred(tmp_path):
+    """Write a credential cache for an account, returns its path"""
+    def make(name="alice"):
+        path = tmp_path / f"{name}.json"
+        path.write_text(json.dumps({"app_token": name}))
+        return str(path)
+    return make
+
+
+@pytest.fixture
+def cli(capsys):
+    """Run htbcli in-process, returns (exit code, stdout)"""
+    def run(*argv):
+        from htbcli.__main__ import HTBCLI
+        h = HTBCLI(["--no-agent"] + list(argv))
+        try:
+            code = h.report(h.run)
+        finally:
+            if getattr(h, "client", None) is not None:
+                atexit.unregister(h.client.dump_to_cache)
+        return code, capsys.readouterr().out
+    return run
+
+
+def endpoints(api) -> list:
+    return [f"{method} {path}" for method, path, _ in api.requests]
@@ -0,0 +1,45 @@
+import io
+import threading
+
+import pytest
+
+from htbcli.utils import agent
+
+pytestmark = pytest.mark.skipif(not agent.agent_supported(), reason="needs Unix sockets")
+
+
+@pytest.fixture
+def server(tmp_path):
+    ran = []
+
+    def run_command(argv):
+        ran.append(argv)
+        print("ran " + " ".join(argv))
+    srv = agent.AgentServer(str(tmp_path / "agent.sock"), run_command, identity="cache:/creds/alice.json")
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv, ran
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_runs_commands_for_the_same_login(server):
+    srv, ran = server
+    out = io.StringIO()
+    code = agent.forward(["machine", "-n", "Lame"], srv.socket_path, out, identity="cache:/creds/alice.json")
+    assert code == 0
+    assert ran == [["machine", "-n", "Lame"]]
+    assert out.getvalue() == "ran machine -n Lame\n"
+
+
+@pytest.mark.parametrize("identity", ["cache:/creds/bob.json", None])
+def test_refuses_other_logins(server, identity):
+    srv, ran = server
+    assert agent.forward(["machine", "-n", "Lame", "-s"], srv.socket_path, io.StringIO(), identity=identity) is None
+    assert ran == []
+
+
+def test_socket_is_owner_only(server):
+    import os
+    srv, _ = server
+    assert os.stat(srv.socket_path).st_mode & 0o077 == 0
@@ -0,0 +1,18 @@
+import pytest
+
+from htbcli.utils.batch import op_to_argv
+
+
+def test_list_operation():
+    assert op_to_argv(["machine", "-n", "Lame", "-s"]) == ["machine", "-n", "Lame", "-s"]
+
+
+def test_mapping_operation():
+    op = {"subcommand": "challenge", "name": 2, "start_docker": True, "stop": False, "path": None}
+    assert op_to_argv(op) == ["challenge", "--name", "2", "--start-docker"]
+
+
+@pytest.mark.parametrize("op", [["agent"], {"name": "Lame"}, "machine -n Lame", []])
+def test_invalid_operations(op):
+    with pytest.raises(ValueError):
+        op_to_argv(op)
@@ -0,0 +1,31 @@
+import os
+
+from htbcli.utils.cache import MetadataCache
+from mock_api import MACHINE
+
+
+def test_save_and_load(tmp_path):
+    cache = MetadataCache(str(tmp_path / "metadata.json"))
+    cache.store("machine", MACHINE)
+    cache.save()
+    assert MetadataCache(str(tmp_path / "metadata.json")).lookup("machine", "lame")["id"] == MACHINE["id"]
+    assert os.listdir(tmp_path) == ["metadata.json"]
+
+
+def test_concurrent_writers_do_not_share_a_temp_file(tmp_path):
+    path = str(tmp_path / "metadata.json")
+    # Left behind by another run saving at the same time
+    open(path + ".tmp", 'w').close()
+    first, second = MetadataCache(path), MetadataCache(path)
+    first.store("machine", MACHINE)
+    second.store("machine", dict(MACHINE, id=5, name="Lazy"))
+    first.save()
+    second.save()
+    assert MetadataCache(path).lookup("machine", "lazy")["id"] == 5
+
+
+def test_unwritable_cache_is_not_an_error(tmp_path):
+    (tmp_path / "file").write_text("")
+    cache = MetadataCache(str(tmp_path / "file" / "metadata.json"))
+    cache.store("machine", MACHINE)
+    cache.save()
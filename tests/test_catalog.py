@@ -0,0 +1,40 @@
+from mock_api import MACHINE, ACTIVE_MACHINE, CHALLENGE
+
+from htbcli.utils.catalog import Catalog, challenge_row, machine_row
+
+
+def make_catalog(tmp_path):
+    catalog = Catalog(str(tmp_path / "catalog.db"))
+    owned = dict(MACHINE, authUserInUserOwns=True, authUserInRootOwns=True)
+    catalog.upsert([machine_row(owned, True), machine_row(ACTIVE_MACHINE, False),
+                    challenge_row(CHALLENGE, True, {}),
+                    challenge_row(dict(CHALLENGE, id=9, name="Baby Reversing", category_name="Reversing",
+                                       points="40", description="Find the password"), False, {})])
+    return catalog
+
+
+def names(rows):
+    return [r["name"] for r in rows]
+
+
+def test_text_search_prefix(tmp_path):
+    assert names(make_catalog(tmp_path).search("decry")) == ["Weak RSA"]
+
+
+def test_filters(tmp_path):
+    catalog = make_catalog(tmp_path)
+    assert names(catalog.search(kind="machine", solved=True)) == ["Lame"]
+    assert names(catalog.search(kind="machine", retired=False)) == ["Keeper"]
+    assert names(catalog.search(category="reversing")) == ["Baby Reversing"]
+    assert names(catalog.search(min_points=30)) == ["Baby Reversing"]
+    assert names(catalog.search(kind="challenge", max_points=30)) == ["Weak RSA"]
+
+
+def test_unchanged_rows_are_skipped(tmp_path):
+    catalog = make_catalog(tmp_path)
+    assert catalog.upsert([machine_row(ACTIVE_MACHINE, False)]) == (0, 0)
+    assert catalog.upsert([machine_row(dict(ACTIVE_MACHINE, points=30), False)]) == (0, 1)
+
+
+def test_search_input_is_not_fts_syntax(tmp_path):
+    assert make_catalog(tmp_path).search('rsa" OR "') == []
@@ -0,0 +1,164 @@
+import os
+
+from conftest import endpoints
+from mock_api import MACHINE
+
+from htbcli.connectors.vpn import VpnInterface
+
+
+def test_stop_active_machine(api, cli, cred):
+    api.reset(active=MACHINE)
+    code, out = cli("-c", cred(), "machine", "-n", "Lame", "--stop")
+    assert code == 0
+    assert endpoints(api) == ["GET machine/active", "POST vm/terminate"]
+
+
+def test_vpn_download_is_owner_only_and_cached(api, cli, cred, tmp_path):
+    code, _ = cli("-c", cred(), "vpn", "-d", str(tmp_path / "lab.ovpn"))
+    assert code == 0
+    assert os.stat(tmp_path / "lab.ovpn").st_mode & 0o777 == 0o600
+    api.reset()
+    code, _ = cli("-c", cred(), "vpn", "-d", str(tmp_path / "again.ovpn"))
+    assert code == 0
+    assert not [e for e in endpoints(api) if "ovpnfile" in e]
+
+
+def test_vpn_configs_are_per_account(api, cli, cred, tmp_path):
+    for name in ("alice", "bob"):
+        code, _ = cli("-c", cred(name), "vpn", "-d", str(tmp_path / f"{name}.ovpn"))
+        assert code == 0
+    assert len([e for e in endpoints(api) if "ovpnfile" in e]) == 2
+
+
+def test_not_assigned_is_an_error_not_a_config(api, cli, cred, tmp_path, monkeypatch):
+    monkeypatch.setitem(api.fixtures, "access/ovpnfile/1/0", {"message": "You are not assigned to this server"})
+    code, _ = cli("-c", cred(), "vpn", "-d", str(tmp_path / "lab.ovpn"))
+    assert code == 1
+    assert not (tmp_path / "lab.ovpn").exists()
+
+
+def test_auto_switch_stays_on_best_server(api, client):
+    rtts = {1: 5.0, 2: 500.0, 6: 500.0}
+    VpnInterface(client, None).auto_switch("{id}.test:443", rtt_fn=lambda host, port: rtts[int(host.split('.')[0])])
+    assert not [e for e in endpoints(api) if "switch" in e]
+
+
+def test_auto_switch_moves_to_best_server(api, client):
+    rtts = {1: 500.0, 2: 5.0, 6: 500.0}
+    VpnInterface(client, None).auto_switch("{id}.test:443", rtt_fn=lambda host, port: rtts[int(host.split('.')[0])])
+    assert "POST connections/servers/switch/2" in endpoints(api)
+
+
+def test_prefix_match_is_refused_for_spawn(api, cli, cred):
+    code, out = cli("-c", cred(), "--output", "json", "machine", "-n", "Kee", "-s")
+    assert code == 2
+    assert '"reason": "ambiguous_name"' in out and '"Keeper"' in out
+    assert not [e for e in endpoints(api) if e.startswith("POST")]
+
+
+def test_prefix_match_is_fine_for_info(api, cli, cred):
+    code, out = cli("-c", cred(), "machine", "-n", "Kee")
+    assert code == 0
+    assert "Resolved 'Kee' to Keeper" in out
+
+
+def test_exact_name_is_used_without_syncing(api, cli, cred):
+    from htbcli.utils.index import NameIndex
+    index = NameIndex()
+    index.update("machine", [{"id": 1, "name": "Lame"}])
+    index.save()
+    cli("-c", cred(), "machine", "-n", "Lame", "-s")
+    assert not [e for e in endpoints(api) if "machine/list" in e]
+    assert "POST vm/spawn" in endpoints(api)
+
+
+def test_batch_marks_reported_errors_as_failed(api, cli, cred, tmp_path, monkeypatch):
+    import json
+    # Flag submissions are wrong on the mock, the connector reports that as an error event
+    monkeypatch.setitem(api.fixtures, "machine/own", {"message": "Incorrect flag!", "success": False})
+    manifest = tmp_path / "ops.jsonl"
+    manifest.write_text(json.dumps(["machine", "-n", "1", "-f", "nope", "-d", "50"]) + "\n"
+                        + json.dumps(["machine", "-n", "1"]) + "\n")
+    code, out = cli("-c", cred(), "batch", "--stop-on-error", str(manifest))
+    results = [json.loads(line) for line in out.splitlines() if line.startswith("{")]
+    assert code == 1
+    assert len(results) == 1 and results[0]["ok"] is False and results[0]["error"]
+
+
+def test_catalog_solves_are_per_account(api, cli, cred, monkeypatch):
+    from mock_api import ACTIVE_MACHINE
+    owned = dict(ACTIVE_MACHINE, authUserInUserOwns=True, authUserInRootOwns=True)
+    monkeypatch.setitem(api.fixtures, "machine/list", {"info": [owned]})
+    assert cli("-c", cred("alice"), "sync", "--type", "machine")[0] == 0
+    monkeypatch.setitem(api.fixtures, "machine/list", {"info": [ACTIVE_MACHINE]})
+    assert cli("-c", cred("bob"), "sync", "--type", "machine", "--full")[0] == 0
+    assert "Keeper" in cli("-c", cred("alice"), "search", "--solved")[1]
+    assert "Keeper" not in cli("-c", cred("bob"), "search", "--solved")[1]
+
+
+def expired_token():
+    import base64
+    import json
+    import time
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": time.time() - 60}).encode()).decode().rstrip("=")
+    return f"e30.{payload}.sig"
+
+
+def test_fleet_never_prompts_for_an_expired_login(api, cli, cred, tmp_path, monkeypatch):
+    import builtins
+    import json
+
+    prompts = []
+
+    def prompt(*args):
+        prompts.append(args)
+        raise EOFError
+    monkeypatch.setattr(builtins, "input", prompt)
+    monkeypatch.setitem(api.fixtures, "login/refresh", {"message": "Unauthenticated."})
+    expired = tmp_path / "expired.json"
+    expired.write_text(json.dumps({"access_token": expired_token(), "refresh_token": "old", "app_token": None}))
+    profiles = tmp_path / "profiles.txt"
+    profiles.write_text(f"alice={cred('alice')}\nexpired={expired}\n")
+    code, out = cli("--profiles", str(profiles), "machine", "-n", "Lame", "-s")
+    assert code == 1
+    assert "1/2 account(s) succeeded" in out
+    assert prompts == []
+
+
+def test_fleet_vpn_download_gives_each_account_its_own_file(api, cli, cred, tmp_path):
+    profiles = tmp_path / "profiles.txt"
+    profiles.write_text(f"alice={cred('alice')}\nbob={cred('bob')}\n")
+    code, _ = cli("--profiles", str(profiles), "vpn", "-d", str(tmp_path / "{profile}.ovpn"))
+    assert code == 0
+    assert (tmp_path / "alice.ovpn").exists() and (tmp_path / "bob.ovpn").exists()
+
+
+def test_fleet_vpn_download_to_one_path_is_refused(api, cli, cred, tmp_path):
+    profiles = tmp_path / "profiles.txt"
+    profiles.write_text(f"alice={cred('alice')}\nbob={cred('bob')}\n")
+    code, out = cli("--profiles", str(profiles), "vpn", "-d", str(tmp_path))
+    assert code == 1
+    assert "{profile}" in out
+    assert not [e for e in endpoints(api) if "ovpnfile" in e]
+
+
+def test_flag_without_difficulty_is_a_usage_error(api, cli, cred):
+    code, out = cli("-c", cred(), "--output", "json", "machine", "-n", "Lame", "-s", "-f", "HTB{x}")
+    assert code == 2
+    assert '"reason": "usage"' in out
+    assert not [e for e in endpoints(api) if e.startswith("POST")]
+
+
+def test_spawn_refused_by_both_endpoints_is_an_error(api, cli, cred, monkeypatch):
+    monkeypatch.setitem(api.fixtures, "vm/spawn", {"message": "Not now"})
+    monkeypatch.setitem(api.fixtures, "machine/play/1", {"message": "You can't play this machine"})
+    code, out = cli("-c", cred(), "--output", "json", "machine", "-n", "1", "-s")
+    assert code == 1
+    assert "You can't play this machine" in out and '"event": "spawn"' not in out
+
+
+def test_spawn_without_an_ip_is_an_error(api, cli, cred, monkeypatch):
+    monkeypatch.setitem(api.fixtures, "machine/profile/1", {"info": dict(MACHINE, ip=None)})
+    code, out = cli("-c", cred(), "--output", "json", "machine", "-n", "1", "-s")
+    assert code == 1
+    assert '"reason": "no_ip"' in out and '"event": "spawn"' not in out
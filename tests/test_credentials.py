@@ -0,0 +1,68 @@
+import atexit
+import base64
+import json
+import os
+import stat
+import time
+
+from htbcli.connectors.client import SessionClient
+from htbcli.utils.credentials import CredentialStore, FileBackend, REFRESH_SKEW, expires_soon, write_private
+
+
+def token(expires_in: float) -> str:
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": time.time() + expires_in}).encode()).decode().rstrip("=")
+    return f"e30.{payload}.sig"
+
+
+def client(api, path):
+    c = SessionClient(cache=str(path), api_base=api.base)
+    atexit.unregister(c.dump_to_cache)
+    return c
+
+
+def mode(path) -> int:
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_write_private_is_owner_only(tmp_path):
+    path = tmp_path / "new" / "tokens.json"
+    write_private(str(path), b"{}")
+    assert mode(path) == 0o600
+    assert mode(path.parent) == 0o700
+
+
+def test_write_private_tightens_an_existing_file(tmp_path):
+    path = tmp_path / "tokens.json"
+    path.write_text("old")
+    os.chmod(path, 0o644)
+    write_private(str(path), b"new")
+    assert mode(path) == 0o600 and path.read_bytes() == b"new"
+
+
+def test_store_round_trip(tmp_path):
+    store = CredentialStore(FileBackend(str(tmp_path / "credentials.json")))
+    store.save({"access_token": "a", "refresh_token": "r", "app_token": None})
+    assert store.load()["refresh_token"] == "r"
+    assert mode(tmp_path / "credentials.json") == 0o600
+
+
+def test_expires_soon():
+    assert expires_soon(token(REFRESH_SKEW - 10))
+    assert not expires_soon(token(REFRESH_SKEW + 600))
+    assert not expires_soon("not-a-jwt")
+
+
+def test_refreshes_before_expiry_and_saves(api, tmp_path):
+    path = tmp_path / "cache.json"
+    path.write_text(json.dumps({"access_token": token(60), "refresh_token": "old", "app_token": None}))
+    client(api, path)
+    assert [p for _, p, _ in api.requests] == ["login/refresh"]
+    assert json.loads(path.read_text())["access_token"] == "mock"
+    assert mode(path) == 0o600
+
+
+def test_fresh_token_is_not_refreshed(api, tmp_path):
+    path = tmp_path / "cache.json"
+    path.write_text(json.dumps({"access_token": token(3600), "refresh_token": "old", "app_token": None}))
+    client(api, path)
+    assert api.requests == []
@@ -0,0 +1,57 @@
+import hashlib
+
+from htbcli.utils.download import stream_download
+
+
+def test_full_download(api, client, tmp_path):
+    path = str(tmp_path / "chall.zip")
+    path, size, sha256 = stream_download(client, "challenge/download/2", path, progress=False)
+    assert size == len(api.zip)
+    assert sha256 == hashlib.sha256(api.zip).hexdigest()
+    assert open(path, 'rb').read() == api.zip
+
+
+def etag(data):
+    return '"%s"' % hashlib.sha1(data).hexdigest()[:16]
+
+
+def partial(path, data, validator):
+    with open(path + ".part", 'wb') as f:
+        f.write(data)
+    if validator is not None:
+        with open(path + ".part.validator", 'w') as f:
+            f.write(validator)
+
+
+def test_resumes_from_part_file(api, client, tmp_path):
+    path = str(tmp_path / "chall.zip")
+    partial(path, api.zip[:1000], etag(api.zip))
+    _, size, sha256 = stream_download(client, "challenge/download/2", path, progress=False)
+    assert size == len(api.zip)
+    assert sha256 == hashlib.sha256(api.zip).hexdigest()
+    assert not (tmp_path / "chall.zip.part.validator").exists()
+
+
+def test_part_file_of_an_older_version_is_not_spliced(api, client, tmp_path):
+    path = str(tmp_path / "chall.zip")
+    # Same length, different contents: only the validator tells them apart
+    partial(path, b"x" * 1000, etag(b"old" + api.zip[3:]))
+    stream_download(client, "challenge/download/2", path, progress=False)
+    assert open(path, 'rb').read() == api.zip
+
+
+def test_part_file_without_validator_starts_over(api, client, tmp_path):
+    path = str(tmp_path / "chall.zip")
+    partial(path, b"x" * 1000, None)
+    stream_download(client, "challenge/download/2", path, progress=False)
+    assert open(path, 'rb').read() == api.zip
+
+
+def test_restarts_when_part_file_is_past_the_end(api, client, tmp_path):
+    path = str(tmp_path / "chall.zip")
+    partial(path, b"x" * (len(api.zip) + 10), etag(api.zip))
+    _, size, _ = stream_download(client, "challenge/download/2", path, progress=False)
+    assert size == len(api.zip)
+    assert open(path, 'rb').read() == api.zip
+    # One 416 for the stale part file, then a fresh download
+    assert len(api.requests) == 2
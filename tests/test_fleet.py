@@ -0,0 +1,35 @@
+import pytest
+
+from htbcli.utils.fleet import check_fleet_args, load_profiles, profile_argv
+
+
+def test_profile_argv_swaps_cache_and_fills_profile():
+    argv = ["-c", "mine.json", "--profiles", "p.txt", "--fleet-workers", "8", "vpn", "-d", "vpn/{profile}.ovpn"]
+    assert profile_argv(argv, "bob", "/creds/bob.json") == \
+        ["-c", "/creds/bob.json", "--no-agent", "vpn", "-d", "vpn/bob.ovpn"]
+
+
+def test_profile_argv_equals_forms():
+    argv = ["--cache=mine.json", "--profiles=p.txt", "machine", "-n", "Lame", "-s"]
+    assert profile_argv(argv, "a", "a.json") == ["-c", "a.json", "--no-agent", "machine", "-n", "Lame", "-s"]
+
+
+def test_load_profiles_lines(tmp_path):
+    path = tmp_path / "p.txt"
+    path.write_text("# students\nalice=/c/alice.json\n/c/bob.json\n")
+    assert load_profiles(str(path)) == {"alice": "/c/alice.json", "bob": "/c/bob.json"}
+
+
+def test_load_profiles_rejects_duplicates(tmp_path):
+    path = tmp_path / "p.txt"
+    path.write_text("a=/x.json\na=/y.json\n")
+    with pytest.raises(ValueError):
+        load_profiles(str(path))
+
+
+def test_vpn_download_needs_profile_placeholder():
+    from htbcli.__main__ import build_parser
+    args = build_parser().parse_args(["vpn", "-d", "out/"])
+    assert check_fleet_args(args, 1) is None
+    assert "{profile}" in check_fleet_args(args, 2)
+    assert check_fleet_args(build_parser().parse_args(["vpn", "-d", "out/{profile}.ovpn"]), 2) is None
@@ -0,0 +1,36 @@
+from htbcli.utils.index import NameIndex
+
+
+def make_index(tmp_path):
+    index = NameIndex(str(tmp_path / "index.json"))
+    index.update("machine", [{"id": 1, "name": "Lame"}, {"id": 2, "name": "Keeper"}, {"id": 3, "name": "Legacy"},
+                             {"id": 4, "name": "Lazy"}])
+    return index
+
+
+def test_exact_and_case_insensitive(tmp_path):
+    assert make_index(tmp_path).resolve("machine", " lame ") == (1, "Lame")
+
+
+def test_unique_prefix(tmp_path):
+    assert make_index(tmp_path).resolve("machine", "kee") == (2, "Keeper")
+
+
+def test_ambiguous_prefix_is_not_guessed(tmp_path):
+    assert make_index(tmp_path).resolve("machine", "l") is None
+
+
+def test_fuzzy_match(tmp_path):
+    assert make_index(tmp_path).resolve("machine", "Legacyy") == (3, "Legacy")
+
+
+def test_saved_index_loads_back(tmp_path):
+    make_index(tmp_path).save()
+    assert NameIndex(str(tmp_path / "index.json")).resolve("machine", "Lazy") == (4, "Lazy")
+
+
+def test_exact_and_candidates(tmp_path):
+    index = make_index(tmp_path)
+    assert index.exact("machine", "LAME") == (1, "Lame")
+    assert index.exact("machine", "Lam") is None
+    assert set(index.candidates("machine", "la")) == {"Lame", "Lazy"}
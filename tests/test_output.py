@@ -0,0 +1,36 @@
+import io
+import json
+
+from htbcli.utils.colors import good, info, important, printError
+from htbcli.utils.output import Emitter, split_message, EXIT_ERROR, EXIT_OK, EXIT_RATE_LIMITED
+
+
+def test_split_message_levels():
+    assert split_message(good + "Switched!") == ("success", "Switched!")
+    assert split_message(printError + "Nope") == ("error", "Nope")
+    assert split_message(important + "Careful") == ("warning", "Careful")
+    assert split_message(info + "Working") == ("info", "Working")
+
+
+def test_split_message_continuation_line():
+    assert split_message("  \\\\--> Server: EU Free 1") == ("info", "Server: EU Free 1")
+
+
+def test_exit_code():
+    emitter = Emitter("json", io.StringIO())
+    assert emitter.exit_code(None) == EXIT_OK
+    assert emitter.exit_code("message") == EXIT_ERROR
+    assert emitter.exit_code(EXIT_RATE_LIMITED) == EXIT_RATE_LIMITED
+    emitter.emit("error", printError + "failed")
+    assert emitter.exit_code(None) == EXIT_ERROR
+    assert emitter.exit_code(0) == EXIT_ERROR
+
+
+def test_ndjson_events_and_exit_line():
+    stream = io.StringIO()
+    emitter = Emitter("ndjson", stream)
+    emitter.emit("spawn", good + "Lame started @ 10.10.10.3", ip="10.10.10.3")
+    emitter.finish(emitter.exit_code(None))
+    lines = [json.loads(l) for l in stream.getvalue().splitlines()]
+    assert lines[0]["event"] == "spawn" and lines[0]["ip"] == "10.10.10.3" and lines[0]["level"] == "success"
+    assert lines[-1] == {"event": "exit", "level": "info", "exit_code": 0}
@@ -0,0 +1,42 @@
+from hackthebox.vpn import VPNServer
+
+from htbcli.utils.probe import ProbeCache, rank_servers
+
+
+def servers():
+    data = [{"id": 1, "friendly_name": "EU Free 1", "current_clients": 100, "location": "EU"},
+            {"id": 2, "friendly_name": "EU Free 2", "current_clients": 10, "location": "EU"},
+            {"id": 3, "friendly_name": "US Free 1", "current_clients": 0, "location": "US"}]
+    return [VPNServer(d, None) for d in data]
+
+
+RTTS = {"eu-free-1": 20.0, "eu-free-2": 30.0, "us-free-1": None}
+
+
+def test_ranks_by_rtt_and_load_without_unreachable():
+    ranked = rank_servers(servers(), "{slug}.test:443", rtt_fn=lambda host, port: RTTS[host.split('.')[0]])
+    assert [s.friendly_name for _, _, s in ranked] == ["EU Free 2", "EU Free 1"]
+
+
+def test_template_fields():
+    seen = []
+    rank_servers(servers()[:1], "{location}-{id}.test:1337", rtt_fn=lambda host, port: seen.append((host, port)) or 1.0)
+    assert seen == [("eu-1.test", 1337)]
+
+
+def test_cached_results_are_not_probed_again(tmp_path):
+    cache = ProbeCache(str(tmp_path / "probes.json"))
+    calls = []
+
+    def rtt(host, port):
+        calls.append(host)
+        return 10.0
+    rank_servers(servers(), "{slug}.test:443", cache=cache, rtt_fn=rtt)
+    rank_servers(servers(), "{slug}.test:443", cache=ProbeCache(str(tmp_path / "probes.json")), rtt_fn=rtt)
+    assert len(calls) == 3
+
+
+def test_unwritable_probe_cache_is_not_an_error(tmp_path):
+    (tmp_path / "file").write_text("")
+    cache = ProbeCache(str(tmp_path / "file" / "probes.json"))
+    rank_servers(servers(), "{slug}.test:443", cache=cache, rtt_fn=lambda host, port: 1.0)
@@ -0,0 +1,30 @@
+import time
+from email.utils import formatdate
+
+from htbcli.utils.ratelimit import RateLimiter, backoff_delay, parse_retry_after, MAX_DELAY
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert 25 < parse_retry_after(formatdate(time.time() + 30, usegmt=True)) <= 30
+    assert parse_retry_after(formatdate(time.time() - 30, usegmt=True)) == 0.0
+
+
+def test_backoff_delay():
+    assert 2.0 <= backoff_delay(0, 2.0) <= 2.5
+    assert backoff_delay(0, 3600) <= MAX_DELAY + 0.5
+    assert all(0.5 <= backoff_delay(3) <= 8 for _ in range(50))
+
+
+def test_bucket_allows_burst_then_waits(tmp_path):
+    limiter = RateLimiter(rate=1.0, burst=3, path=str(tmp_path / "rl.json"))
+    assert [limiter._take() for _ in range(3)] == [0, 0, 0]
+    assert 0 < limiter._take() <= 1.0
+
+
+def test_penalize_blocks_other_limiters_on_the_same_file(tmp_path):
+    path = str(tmp_path / "rl.json")
+    RateLimiter(rate=100.0, burst=10, path=path).penalize(5)
+    assert 4 < RateLimiter(rate=100.0, burst=10, path=path)._take() <= 5